@@ -0,0 +1,138 @@
+# Benchmark: validation / serialization cost of the Product models from ch14 - ch18
+#   ch14 plain fields, ch15 Body(embed=True), ch16 Field constraints + regex pattern,
+#   ch17 nested Category, ch18 Field examples
+# For each model it measures direct pydantic validation / serialization (1 item and
+# a batch of 10k) and a full request through the app (ASGI, no network), and writes
+# the results as JSON so runs before / after a pydantic or FastAPI upgrade can be compared.
+#
+# Run from the repository root:
+#   python benchmarks/validation_benchmark.py --output benchmarks/results.json
+import argparse
+import asyncio
+import importlib.util
+import json
+import platform
+import time
+import tracemalloc
+from pathlib import Path
+
+import fastapi
+import httpx
+import pydantic
+from pydantic import TypeAdapter
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PRODUCT = {"name": "Iphone15", "price": 799.0, "stock": 25}
+CATEGORY = {"name": "electronics", "description": "Phones, laptops and gadgets"}
+
+# chapter -> request used for the full ASGI round trip and the payload of one Product
+CASES = {
+    "ch14": {"method": "PUT", "url": "/products/1?discount=10", "product": {"id": 1, **PRODUCT}, "embed": None},
+    "ch15": {"method": "POST", "url": "/product", "product": PRODUCT, "embed": "product"},
+    "ch16": {"method": "POST", "url": "/product", "product": PRODUCT, "embed": None},
+    "ch17": {"method": "POST", "url": "/products", "product": {**PRODUCT, "category": CATEGORY}, "embed": None},
+    "ch18": {"method": "POST", "url": "/products", "product": PRODUCT, "embed": None},
+}
+
+
+def load_app(chapter):
+    path = ROOT / chapter / "app" / "main.py"
+    spec = importlib.util.spec_from_file_location(f"{chapter}_main", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# best of `repeat` runs, in seconds per call
+def best_time(func, number, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+# peak bytes allocated while running func once
+def peak_allocations(func):
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+async def request_time(app, case, requests):
+    body = {case["embed"]: case["product"]} if case["embed"] else case["product"]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.request(case["method"], case["url"], json=body)
+        response.raise_for_status()
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.request(case["method"], case["url"], json=body)
+        return (time.perf_counter() - start) / requests
+
+
+def run_case(chapter, case, batch_size, requests):
+    module = load_app(chapter)
+    Product = module.Product
+    single = case["product"]
+    single_json = json.dumps(single).encode()
+    batch = [single] * batch_size
+    batch_json = json.dumps(batch).encode()
+    batch_adapter = TypeAdapter(list[Product])
+    item = Product.model_validate(single)
+    items = batch_adapter.validate_python(batch)
+
+    results = {
+        "validate_python_1": best_time(lambda: Product.model_validate(single), 10_000),
+        "validate_json_1": best_time(lambda: Product.model_validate_json(single_json), 10_000),
+        "dump_json_1": best_time(lambda: item.model_dump_json(), 10_000),
+        f"validate_python_{batch_size}": best_time(lambda: batch_adapter.validate_python(batch), 1, repeat=3),
+        f"validate_json_{batch_size}": best_time(lambda: batch_adapter.validate_json(batch_json), 1, repeat=3),
+        f"dump_json_{batch_size}": best_time(lambda: batch_adapter.dump_json(items), 1, repeat=3),
+        "asgi_request_1": asyncio.run(request_time(module.app, case, requests)),
+    }
+    allocations = {
+        f"validate_python_{batch_size}": peak_allocations(lambda: batch_adapter.validate_python(batch)),
+        f"validate_json_{batch_size}": peak_allocations(lambda: batch_adapter.validate_json(batch_json)),
+        f"dump_json_{batch_size}": peak_allocations(lambda: batch_adapter.dump_json(items)),
+    }
+    return {"chapter": chapter, "seconds": results, "peak_bytes": allocations}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Product model validation benchmark (ch14 - ch18)")
+    parser.add_argument("--output", default="benchmarks/results.json")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=1_000)
+    parser.add_argument("--chapters", nargs="*", default=list(CASES))
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "pydantic": pydantic.VERSION,
+        "fastapi": fastapi.__version__,
+        "batch_size": args.batch_size,
+        "cases": [],
+    }
+    for chapter in args.chapters:
+        result = run_case(chapter, CASES[chapter], args.batch_size, args.requests)
+        report["cases"].append(result)
+        seconds = result["seconds"]
+        print(
+            f"{chapter}: validate {seconds['validate_python_1'] * 1e6:6.2f} µs | "
+            f"dump {seconds['dump_json_1'] * 1e6:6.2f} µs | "
+            f"{args.batch_size} items {seconds[f'validate_python_{args.batch_size}'] * 1e3:7.2f} ms | "
+            f"request {seconds['asgi_request_1'] * 1e6:7.1f} µs"
+        )
+
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
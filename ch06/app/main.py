@@ -1,5 +1,7 @@
 from fastapi import FastAPI
 
+from radix import use_radix_router
+
 app = FastAPI()
 
 ##Order matters
@@ -10,4 +12,9 @@ async def single_product_static():
 
 @app.get("/product/{product_title}")
 async def single_product_static(product_title:str):
-    return {"response": "Single Data Fetched","product_title" : product_title}
\ No newline at end of file
+    return {"response": "Single Data Fetched","product_title" : product_title}
+
+## Optional: radix tree route matching (app/radix.py)
+# Same precedence as above (declaration order), but the path is resolved segment by segment
+# instead of trying every route's regex. Remove this line to use Starlette's default router.
+use_radix_router(app)
@@ -0,0 +1,113 @@
+from starlette.datastructures import URL
+from starlette.responses import RedirectResponse
+from starlette.routing import Match, Route, get_route_path
+
+
+# Radix tree router (optional)
+# Starlette tries every route's regex in declaration order until one matches, so the cost
+# grows with the number of routes. Here the path is first walked segment by segment:
+# static segments are a dict lookup, `{parameter}` segments are followed as a fallback.
+# That leaves a handful of candidate routes, which are then checked exactly as Starlette
+# does it (route.matches(), in declaration order), so precedence stays the same:
+# /product/roe_nt_usb still wins over /product/{product_title} only if it is declared first.
+class RadixNode:
+    __slots__ = ("static", "param", "routes")
+
+    def __init__(self):
+        self.static = {}
+        self.param = None
+        self.routes = []  # indexes (declaration order) of the routes ending here
+
+
+class RadixRouteIndex:
+    def __init__(self, router):
+        self.router = router
+        self._indexed = None
+
+    def _build(self):
+        routes = self.router.routes
+        self.root = RadixNode()
+        # routes the tree can't describe (mounts, {name:path} parameters, ...) are always candidates
+        self.always = []
+        for index, route in enumerate(routes):
+            if not isinstance(route, Route) or ":path}" in route.path:
+                self.always.append(index)
+                continue
+            node = self.root
+            for segment in route.path.split("/"):
+                if "{" in segment:
+                    if node.param is None:
+                        node.param = RadixNode()
+                    node = node.param
+                else:
+                    node = node.static.setdefault(segment, RadixNode())
+            node.routes.append(index)
+        self._indexed = (len(routes), id(routes[-1]) if routes else None)
+
+    def candidates(self, path: str):
+        routes = self.router.routes
+        # routes can still be added after startup: rebuild when the list changed
+        if self._indexed != (len(routes), id(routes[-1]) if routes else None):
+            self._build()
+        found = list(self.always)
+        segments = path.split("/")
+        stack = [(self.root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if depth == len(segments):
+                found.extend(node.routes)
+                continue
+            child = node.static.get(segments[depth])
+            if child is not None:
+                stack.append((child, depth + 1))
+            if node.param is not None:
+                stack.append((node.param, depth + 1))
+        found.sort()
+        return [routes[index] for index in found]
+
+    # Same steps as starlette.routing.Router.app, over the candidates instead of every route
+    async def __call__(self, scope, receive, send):
+        router = self.router
+        if "router" not in scope:
+            scope["router"] = router
+        if scope["type"] == "lifespan":
+            await router.lifespan(scope, receive, send)
+            return
+
+        route_path = get_route_path(scope)
+        partial = None
+        for route in self.candidates(route_path):
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                scope.update(child_scope)
+                await route.handle(scope, receive, send)
+                return
+            elif match == Match.PARTIAL and partial is None:
+                partial = route
+                partial_scope = child_scope
+
+        if partial is not None:
+            scope.update(partial_scope)
+            await partial.handle(scope, receive, send)
+            return
+
+        if scope["type"] == "http" and router.redirect_slashes and route_path != "/":
+            redirect_scope = dict(scope)
+            if route_path.endswith("/"):
+                redirect_scope["path"] = redirect_scope["path"].rstrip("/")
+            else:
+                redirect_scope["path"] = redirect_scope["path"] + "/"
+            for route in self.candidates(get_route_path(redirect_scope)):
+                match, child_scope = route.matches(redirect_scope)
+                if match != Match.NONE:
+                    response = RedirectResponse(url=str(URL(scope=redirect_scope)))
+                    await response(scope, receive, send)
+                    return
+
+        await router.default(scope, receive, send)
+
+
+# Resolve the app's routes through a radix tree (the routes themselves are unchanged)
+def use_radix_router(app):
+    app.router.middleware_stack = RadixRouteIndex(app.router)
+    return app
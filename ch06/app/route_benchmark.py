@@ -0,0 +1,105 @@
+# Benchmark: route resolution with 10 / 100 / 1000 routes, Starlette's router vs app/radix.py
+# Every app has static product routes, category routes with an int parameter, file routes
+# and the /product/{product_title} catch-all declared last.
+# "match" times only finding the route, "request" is a full GET through the ASGI app.
+# Run from the ch06 folder: python app/route_benchmark.py
+import asyncio
+import time
+
+from fastapi import FastAPI
+from starlette.routing import Match
+
+from radix import RadixRouteIndex, use_radix_router
+
+REPEAT = 2_000
+
+
+def build_app(size):
+    app = FastAPI()
+
+    async def endpoint():
+        return {"response": "ok"}
+
+    for i in range(size - 1):
+        if i % 4 < 2:
+            app.add_api_route(f"/product/sku_{i}", endpoint, methods=["GET"])
+        elif i % 4 == 2:
+            app.add_api_route(f"/category/cat_{i}/{{product_id:int}}", endpoint, methods=["GET"])
+        else:
+            app.add_api_route(f"/files/dir_{i}/{{file_name}}", endpoint, methods=["GET"])
+    app.add_api_route("/product/{product_title}", endpoint, methods=["GET"])
+    return app
+
+
+def scope_for(path):
+    return {"type": "http", "method": "GET", "path": path, "root_path": "", "query_string": b"", "headers": []}
+
+
+def starlette_match(router, scope):
+    for route in router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route
+
+
+def radix_match(index, scope):
+    for route in index.candidates(scope["path"]):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route
+
+
+def best_time(func, *args):
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            func(*args)
+        best = min(best, (time.perf_counter() - start) / REPEAT)
+    return best
+
+
+async def request_time(app, path):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        await app(scope_for(path), receive, send)
+    assert messages[0]["status"] == 200, (path, messages[0])
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    print(f"{'routes':>6} | {'path':<26} | {'match':>17} | {'radix match':>17} | {'request':>9} | {'radix request':>13}")
+    for size in (10, 100, 1000):
+        plain = build_app(size)
+        radix = use_radix_router(build_app(size))
+        index = RadixRouteIndex(plain.router)
+        last = size - 2
+        paths = {
+            "first static": "/product/sku_0",
+            "last static": f"/product/sku_{last - last % 4}",
+            "last int parameter": f"/category/cat_{last - (last - 2) % 4}/42",
+            "catch-all (declared last)": "/product/some-title",
+        }
+        for label, path in paths.items():
+            scope = scope_for(path)
+            assert starlette_match(plain.router, scope) is radix_match(index, scope), path
+            match = best_time(starlette_match, plain.router, scope)
+            radix_found = best_time(radix_match, index, scope)
+            request = asyncio.run(request_time(plain, path))
+            radix_request = asyncio.run(request_time(radix, path))
+            print(
+                f"{size:>6} | {label:<26} | {match * 1e6:10.2f} µs     | {radix_found * 1e6:10.2f} µs     | "
+                f"{request * 1e6:6.1f} µs | {radix_request * 1e6:10.1f} µs"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import json
+from bisect import bisect_left, insort
+
+# cached bodies per partition, the oldest one is dropped when there are more
+MAX_CACHED_BODIES = 256
+
+
+# One category's products
+# `products` is the id index, `by_price` / `by_id` are kept sorted with bisect,
+# so listing, counting and sorting a category only ever touch this partition.
+class CategoryPartition:
+    def __init__(self, category: str):
+        self.category = category
+        self.products = {}
+        self.by_price = []  # (price, id)
+        self.by_id = []
+        # bumped on every change, the cached bodies belong to one version
+        self.version = 0
+        self._bodies = {}
+
+    def __len__(self):
+        return len(self.products)
+
+    def add(self, product: dict):
+        self.products[product["id"]] = product
+        insort(self.by_price, (product["price"], product["id"]))
+        insort(self.by_id, product["id"])
+        self.changed()
+
+    def remove(self, product_id: int):
+        product = self.products.pop(product_id)
+        del self.by_price[bisect_left(self.by_price, (product["price"], product_id))]
+        del self.by_id[bisect_left(self.by_id, product_id)]
+        self.changed()
+        return product
+
+    def changed(self):
+        self.version += 1
+        self._bodies.clear()
+
+    def list(self, sort: str = "id", descending: bool = False, limit: int = 10, offset: int = 0):
+        entries = self.by_price if sort == "price" else self.by_id
+        if descending:
+            page = entries[max(len(entries) - offset - limit, 0):max(len(entries) - offset, 0)][::-1]
+        else:
+            page = entries[offset:offset + limit]
+        if sort == "price":
+            page = [product_id for _, product_id in page]
+        return [self.products[product_id] for product_id in page]
+
+    # JSON body of one page, built once per partition version
+    def body(self, sort: str = "id", descending: bool = False, limit: int = 10, offset: int = 0) -> bytes:
+        key = (sort, descending, limit, offset)
+        body = self._bodies.get(key)
+        if body is None:
+            if len(self._bodies) >= MAX_CACHED_BODIES:
+                del self._bodies[next(iter(self._bodies))]
+            body = self._bodies[key] = json.dumps({
+                "category": self.category,
+                "total": len(self.products),
+                "limit": limit,
+                "offset": offset,
+                "products": self.list(sort, descending, limit, offset),
+            }).encode()
+        return body
+
+
+# Catalog partitioned by category
+# `locations` (id -> category) finds a product's partition, so a product that changes
+# category is removed from one partition and added to the other; no other partition
+# (and none of its cached bodies) is touched.
+class PartitionedCatalog:
+    def __init__(self, categories, products=()):
+        self.partitions = {category: CategoryPartition(category) for category in categories}
+        self.locations = {}
+        for product in products:
+            self.add(product)
+
+    def partition(self, category: str) -> CategoryPartition:
+        return self.partitions[category]
+
+    def count(self, category: str) -> int:
+        return len(self.partitions[category])
+
+    def get(self, product_id: int):
+        category = self.locations.get(product_id)
+        if category is None:
+            return None
+        return self.partitions[category].products[product_id]
+
+    # Create or replace a product
+    def add(self, product: dict):
+        product = dict(product)
+        self.delete(product["id"])
+        self.partitions[product["category"]].add(product)
+        self.locations[product["id"]] = product["category"]
+        return product
+
+    # Update only the given fields; a new price or category moves the product
+    def update(self, product_id: int, fields: dict):
+        category = self.locations.get(product_id)
+        if category is None:
+            return None
+        partition = self.partitions[category]
+        product = partition.products[product_id]
+        if fields.get("category", category) != category or fields.get("price", product["price"]) != product["price"]:
+            partition.remove(product_id)
+            product.update(fields)
+            self.partitions[product["category"]].add(product)
+            self.locations[product_id] = product["category"]
+        else:
+            product.update(fields)
+            partition.changed()
+        return product
+
+    def delete(self, product_id: int):
+        category = self.locations.pop(product_id, None)
+        if category is None:
+            return None
+        return self.partitions[category].remove(product_id)
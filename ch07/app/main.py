@@ -1,5 +1,9 @@
-from fastapi import  FastAPI
+from fastapi import  FastAPI, HTTPException, Query, Response
 from enum import Enum
+from typing import Annotated, Literal
+from pydantic import BaseModel
+
+from catalog import PartitionedCatalog
 
 app = FastAPI()
 
@@ -11,9 +15,69 @@ class ProductCategory(str, Enum):
     electronics = "electronics"
 
 # Use the Enum as the type for the path parameter
+# @app.get("/product/{category}")
+# async def get_products(category:ProductCategory):
+#     return {"response": "Products fetched", "category": category}
+
+## Catalog partitioned by category (see app/catalog.py)
+class Product(BaseModel):
+    id: int
+    name: str
+    price: float
+    category: ProductCategory
+
+# Only the fields that are sent are changed (exclude_unset), so the fields are not nullable:
+# the defaults are never used, and an explicit null is a 422 instead of a None in the catalog
+class ProductUpdate(BaseModel):
+    name: str = None
+    price: float = None
+    category: ProductCategory = None
+
+CATALOG = PartitionedCatalog(
+    [category.value for category in ProductCategory],
+    [
+        {"id": 1, "name": "Clean Code", "price": 37.5, "category": "books"},
+        {"id": 2, "name": "Fluent Python", "price": 49.99, "category": "books"},
+        {"id": 3, "name": "Cotton Jacket", "price": 55.99, "category": "clothing"},
+        {"id": 4, "name": "Running Shoes", "price": 89.0, "category": "clothing"},
+        {"id": 5, "name": "Iphone 15", "price": 799.0, "category": "electronics"},
+        {"id": 6, "name": "Wireless Mouse", "price": 25.5, "category": "electronics"},
+    ],
+)
+
+# The body comes from the partition's cache, rebuilt only after that category changed
 @app.get("/product/{category}")
-async def get_products(category:ProductCategory):
-    return {"response": "Products fetched", "category": category}
+async def get_products(
+    category: ProductCategory,
+    sort: Literal["id", "price"] = "id",
+    order: Literal["asc", "desc"] = "asc",
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    offset: Annotated[int, Query(ge=0)] = 0,
+):
+    body = CATALOG.partition(category.value).body(sort, order == "desc", limit, offset)
+    return Response(body, media_type="application/json")
+
+@app.get("/product/{category}/count")
+async def count_products(category: ProductCategory):
+    return {"category": category, "count": CATALOG.count(category.value)}
+
+@app.post("/product")
+async def create_product(product: Product):
+    return CATALOG.add(product.model_dump(mode="json"))
+
+@app.patch("/product/{product_id}")
+async def update_product(product_id: int, fields: ProductUpdate):
+    product = CATALOG.update(product_id, fields.model_dump(mode="json", exclude_unset=True))
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+@app.delete("/product/{product_id}")
+async def delete_product(product_id: int):
+    product = CATALOG.delete(product_id)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
 
 ## Working with Python enumerations
 # class ProductCategory(str, Enum):
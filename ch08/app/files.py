@@ -0,0 +1,143 @@
+import hashlib
+import os
+import stat
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+import anyio
+from starlette.responses import FileResponse
+
+
+# Stat cache
+# A hot file would otherwise pay a path resolve (one lstat per directory level) and a stat
+# on every request. Entries live for `ttl` seconds, so edits on disk show up after at most
+# that long; missing files are cached too (as None).
+class FileEntry:
+    __slots__ = ("path", "stat", "headers")
+
+    def __init__(self, path: Path, stat_result: os.stat_result):
+        self.path = path
+        self.stat = stat_result
+        etag_base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+        self.headers = {
+            "etag": f'"{hashlib.md5(etag_base.encode(), usedforsecurity=False).hexdigest()}"',
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        }
+
+
+class FileStore:
+    def __init__(self, root, ttl: float = 1.0, maxsize: int = 10_000):
+        self.root = Path(root).resolve()
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # requested path -> (expires_at, FileEntry | None)
+
+    # Path inside the root, None if it escapes it (../, absolute paths, symlinks pointing out)
+    def resolve(self, file_path: str):
+        if "\0" in file_path:
+            return None
+        path = (self.root / file_path).resolve()
+        if not path.is_relative_to(self.root):
+            return None
+        return path
+
+    def _load(self, file_path: str):
+        path = self.resolve(file_path)
+        if path is None:
+            return None
+        try:
+            stat_result = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if not stat.S_ISREG(stat_result.st_mode):
+            return None
+        return FileEntry(path, stat_result)
+
+    async def lookup(self, file_path: str):
+        cached = self._entries.get(file_path)
+        now = time.monotonic()
+        if cached is not None and cached[0] > now:
+            self._entries.move_to_end(file_path)
+            return cached[1]
+        entry = await anyio.to_thread.run_sync(self._load, file_path)
+        self._entries[file_path] = (now + self.ttl, entry)
+        self._entries.move_to_end(file_path)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+
+# If-None-Match (weak comparison) or, without it, If-Modified-Since
+def not_modified(request_headers, entry: FileEntry) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = entry.headers["etag"]
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return int(entry.stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+# FileResponse (Range / multi-range, If-Range, HEAD, http.response.pathsend, chunked reads)
+# that hands the open file to the server when it supports the ASGI zero-copy extension,
+# so the body goes from the page cache to the socket with sendfile() instead of through Python.
+class ZeroCopyFileResponse(FileResponse):
+    chunk_size = 256 * 1024
+
+    async def __call__(self, scope, receive, send):
+        self._zerocopy = "http.response.zerocopysend" in scope.get("extensions", {})
+        await super().__call__(scope, receive, send)
+
+    async def _send_file(self, send, offset: int, count: int):
+        with open(self.path, "rb") as file:
+            await send({
+                "type": "http.response.zerocopysend",
+                "file": file,
+                "offset": offset,
+                "count": count,
+                "more_body": False,
+            })
+
+    async def _handle_simple(self, send, send_header_only, send_pathsend):
+        if not self._zerocopy or send_header_only:
+            return await super()._handle_simple(send, send_header_only, send_pathsend)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await self._send_file(send, 0, self.stat_result.st_size)
+
+    async def _handle_single_range(self, send, start, end, file_size, send_header_only):
+        if not self._zerocopy or send_header_only:
+            return await super()._handle_single_range(send, start, end, file_size, send_header_only)
+        self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        await self._send_file(send, start, end - start)
+
+    # Same part headers as Starlette, but the length is counted from what is actually sent
+    # (every part is followed by "\n" and the body ends with "\n--boundary--\n")
+    def generate_multipart(self, ranges, boundary, max_size, content_type):
+        def part_header(start, end):
+            return (
+                f"--{boundary}\nContent-Type: {content_type}\nContent-Range: bytes {start}-{end - 1}/{max_size}\n\n"
+            ).encode("latin-1")
+
+        content_length = sum(len(part_header(start, end)) + end - start + 1 for start, end in ranges)
+        return content_length + len(f"\n--{boundary}--\n"), part_header
+
+    async def _handle_multiple_ranges(self, send, ranges, file_size, send_header_only):
+        # Starlette 0.47 sets "multipart/byteranges; boundary=..." as Content-Range,
+        # clients need it as the Content-Type of the 206 response
+        async def send_with_content_type(message):
+            if message["type"] == "http.response.start":
+                self.headers["content-type"] = self.headers["content-range"]
+                del self.headers["content-range"]
+                message = {**message, "headers": self.raw_headers}
+            await send(message)
+
+        await super()._handle_multiple_ranges(send_with_content_type, ranges, file_size, send_header_only)
@@ -1,9 +1,25 @@
-from fastapi import FastAPI
+import os
+
+from fastapi import FastAPI, HTTPException, Request, Response
+
+from files import FileStore, ZeroCopyFileResponse, not_modified
 
 app = FastAPI()
 
-@app.get("/files/{file_path:path}")
-async def read_file(file_path: str):
-    return {
-        "your requested file at path" : file_path
-    }
\ No newline at end of file
+# @app.get("/files/{file_path:path}")
+# async def read_file(file_path: str):
+#     return {
+#         "your requested file at path" : file_path
+#     }
+
+# Files are served from FILES_ROOT (default: ./files), nothing outside it can be reached
+FILES = FileStore(os.environ.get("FILES_ROOT", "files"))
+
+@app.api_route("/files/{file_path:path}", methods=["GET", "HEAD"])
+async def read_file(file_path: str, request: Request):
+    entry = await FILES.lookup(file_path)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not_modified(request.headers, entry):
+        return Response(status_code=304, headers=entry.headers)
+    return ZeroCopyFileResponse(entry.path, stat_result=entry.stat, headers=entry.headers)
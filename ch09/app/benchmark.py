@@ -0,0 +1,28 @@
+# Benchmark: lookup / update / delete latency as the catalog grows
+# Run: python app/benchmark.py
+import random
+import timeit
+
+from store import ProductStore
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+LOOPS = 10_000
+
+
+def make_store(size):
+    return ProductStore(
+        {"id": i, "title": f"Product {i}", "price": 9.99, "description": "benchmark item"}
+        for i in range(1, size + 1)
+    )
+
+
+for size in SIZES:
+    store = make_store(size)
+    ids = [random.randint(1, size) for _ in range(LOOPS)]
+
+    lookup = timeit.timeit(lambda: [store.get(i) for i in ids], number=1) / LOOPS
+    update = timeit.timeit(lambda: [store.update(i, {"price": 19.99}) for i in ids], number=1) / LOOPS
+    # delete + re-add so every delete hits an existing id
+    delete = timeit.timeit(lambda: [store.add(store.delete(i)) for i in set(ids)], number=1) / len(set(ids))
+
+    print(f"{size:>9} items | get {lookup * 1e9:7.0f} ns | patch {update * 1e9:7.0f} ns | delete+add {delete * 1e9:7.0f} ns")
@@ -0,0 +1,112 @@
+import json
+from typing import Annotated, Any, Literal, Union
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+from persistence import MAX_ID, MIN_ID
+
+
+## Bulk operations
+# {"op": "create", "product": {...}}
+# {"op": "update", "id": 2, "product": {...}}
+# {"op": "patch", "id": 2, "fields": {"price": 10}}
+# {"op": "delete", "id": 2}
+class BulkProduct(BaseModel):
+    model_config = {"extra": "allow"}
+    id: int = Field(ge=MIN_ID, le=MAX_ID)
+
+class CreateOperation(BaseModel):
+    op: Literal["create"]
+    product: BulkProduct
+
+class UpdateOperation(BaseModel):
+    op: Literal["update"]
+    id: int
+    product: BulkProduct
+
+class PatchOperation(BaseModel):
+    op: Literal["patch"]
+    id: int
+    fields: dict[str, Any]
+
+class DeleteOperation(BaseModel):
+    op: Literal["delete"]
+    id: int
+
+Operation = Annotated[
+    Union[CreateOperation, UpdateOperation, PatchOperation, DeleteOperation],
+    Field(discriminator="op"),
+]
+
+# One TypeAdapter for the whole batch: JSON parsing and validation of every
+# operation happen in a single pydantic-core call
+OPERATIONS = TypeAdapter(list[Operation])
+OPERATION = TypeAdapter(Operation)
+
+
+# Returns one (operation, errors) pair per item, only one of them is set.
+# Raises ValidationError when the body is not a JSON list at all.
+# Errors never echo the input back (include_input=False), the client has sent it.
+def parse_operations(body: bytes):
+    try:
+        return [(operation, None) for operation in OPERATIONS.validate_json(body)]
+    except ValidationError as exc:
+        if not any(error["loc"] and isinstance(error["loc"][0], int) for error in exc.errors()):
+            raise
+    # some items are invalid: validate them one by one to keep the valid ones
+    parsed = []
+    for item in json.loads(body):
+        try:
+            parsed.append((OPERATION.validate_python(item), None))
+        except ValidationError as exc:
+            parsed.append((None, item_errors(exc)))
+    return parsed
+
+
+# Same for NDJSON, one operation per line (blank lines are skipped).
+# The lines are validated as one JSON list first; if that fails, line by line, so a bad
+# line (even one that isn't JSON) only fails itself and its errors carry its line number.
+# The joined list is only trusted with one item per line: a line holding `{...},{...}`
+# would otherwise pass as two operations.
+def parse_lines(body: bytes):
+    lines = [(number, line) for number, line in enumerate(body.splitlines(), 1) if line.strip()]
+    try:
+        operations = OPERATIONS.validate_json(b"[" + b",".join(line for _, line in lines) + b"]")
+        if len(operations) == len(lines):
+            return [(operation, None) for operation in operations]
+    except ValidationError:
+        pass
+    parsed = []
+    for number, line in lines:
+        try:
+            parsed.append((OPERATION.validate_json(line), None))
+        except ValidationError as exc:
+            parsed.append((None, item_errors(exc, ("line", number))))
+    return parsed
+
+
+def item_errors(exc: ValidationError, prefix=()):
+    errors = exc.errors(include_url=False, include_context=False, include_input=False)
+    for error in errors:
+        error["loc"] = (*prefix, *error["loc"])
+    return errors
+
+
+def apply_operations(store, parsed):
+    results = []
+    for index, (operation, errors) in enumerate(parsed):
+        if operation is None:
+            results.append({"index": index, "status": "Invalid", "errors": errors})
+        elif operation.op == "create":
+            product = store.add(operation.product.model_dump())
+            results.append({"index": index, "status": "Created", "product_id": product["id"]})
+        elif operation.op == "update":
+            found = store.replace(operation.id, operation.product.model_dump()) is not None
+            results.append({"index": index, "status": "Updated" if found else "Not found", "product_id": operation.id})
+        elif operation.op == "patch":
+            found = store.update(operation.id, operation.fields) is not None
+            results.append({"index": index, "status": "Partial updated" if found else "Not found", "product_id": operation.id})
+        else:
+            found = store.delete(operation.id) is not None
+            results.append({"index": index, "status": "Deleted" if found else "Not found", "product_id": operation.id})
+    return results
@@ -0,0 +1,60 @@
+# Load test: clients polling an unchanged catalog
+# Run: python app/load_test.py
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+# synthetic products go to a temp store, not to data/
+DATA_DIR = tempfile.TemporaryDirectory()
+os.environ["PRODUCTS_DIR"] = DATA_DIR.name
+
+from main import PRODUCTS, app  # noqa: E402
+
+CATALOG_SIZE = 10_000
+CLIENTS = 10
+REQUESTS_PER_CLIENT = 20
+
+
+# the handler as it was before ETags, for comparison
+@app.get("/product-uncached")
+async def all_products_uncached():
+    return PRODUCTS.all()
+
+
+for i in range(4, CATALOG_SIZE + 1):
+    PRODUCTS.add({"id": i, "title": f"Product {i}", "price": 9.99, "description": "load test item"})
+
+
+async def run(label, url, headers=None):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def poll():
+            for _ in range(REQUESTS_PER_CLIENT):
+                await client.get(url, headers=headers)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(poll() for _ in range(CLIENTS)))
+        elapsed = time.perf_counter() - start
+    total = CLIENTS * REQUESTS_PER_CLIENT
+    print(f"{label}: {total / elapsed:8.0f} req/s")
+    return total / elapsed
+
+
+async def main():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        etag = (await client.get("/product")).headers["ETag"]
+    before = await run("no ETag, re-serialized every time", "/product-uncached")
+    cached = await run("ETag, cached body (200)          ", "/product")
+    after = await run("ETag, If-None-Match (304)        ", "/product", {"If-None-Match": etag})
+    print(f"unchanged polls: {after / before:.0f}x faster than before ({cached / before:.0f}x for clients without If-None-Match)")
+
+
+try:
+    asyncio.run(main())
+finally:
+    PRODUCTS.close()
+    DATA_DIR.cleanup()
@@ -1,8 +1,32 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Annotated, Literal
+from store import ProductStore
+from persistence import MAX_ID, MIN_ID
+from bulk import apply_operations, parse_lines, parse_operations
+from pydantic import BaseModel, Field, ValidationError
+from functools import lru_cache
+from contextlib import asynccontextmanager
+import base64
+import binascii
+import json
+import os
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  yield
+  # fold the change log into the snapshot, so the next start only maps one file
+  PRODUCTS.compact()
+  PRODUCTS.close()
 
-PRODUCTS = [
+app = FastAPI(lifespan=lifespan)
+
+# Products are kept in memory and persisted in data/ (snapshot + change log),
+# the list below is only used the first time, when data/ is empty.
+# PRODUCTS_DIR moves the store elsewhere (the benchmarks use a temp directory).
+PRODUCTS = ProductStore.open(os.environ.get("PRODUCTS_DIR", "data"), default=[
         {
             "id": 1,
             "title": "Fjallraven - Foldsack No. 1 Backpack, Fits 15 Laptops",
@@ -21,52 +45,162 @@ PRODUCTS = [
             "price": 55.99,
             "description": "great outerwear jackets for Spring/Autumn/Winter, suitable for many occasions, such as working, hiking, camping, mountain/rock climbing, cycling, traveling or other outdoors. Good gift choice for you or your family member. A warm hearted love to Father, husband or son in this thanksgiving or Christmas Day."
         },
-    ]
+    ])
+
+# Cursor pagination
+# The cursor is opaque for the client: base64 of the store's sequence number
+def encode_cursor(seq: int) -> str:
+  return base64.urlsafe_b64encode(str(seq).encode()).decode()
+
+def decode_cursor(cursor: str) -> int:
+  try:
+    return int(base64.urlsafe_b64decode(cursor.encode()))
+  except (ValueError, binascii.Error):
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+STREAM_BATCH_SIZE = 1000
+
+# NDJSON export: one product per line, read from the store page by page,
+# so the whole catalog is never encoded in memory at once
+def stream_products(after: int | None, limit: int | None):
+  remaining = limit
+  while True:
+    size = STREAM_BATCH_SIZE if remaining is None else min(STREAM_BATCH_SIZE, remaining)
+    products, after = PRODUCTS.page(after, size)
+    if products:
+      yield "".join(json.dumps(dict(product)) + "\n" for product in products)
+    if remaining is not None:
+      remaining -= len(products)
+    if after is None or remaining == 0:
+      break
+
+# ETag / 304 Not Modified
+# Every write bumps PRODUCTS.version (and the version of the changed product), so an ETag
+# built from the version only changes when the data does. A client sending the ETag back in
+# If-None-Match gets an empty 304 and nothing is serialized.
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+  if not if_none_match:
+    return False
+  tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+  return "*" in tags or etag in tags
+
+def to_json(content) -> bytes:
+  return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+# Serialized product list, rebuilt only when the catalog version changes
+ALL_PRODUCTS_BODY = {"version": None, "body": b""}
+
+def all_products_body(version: int) -> bytes:
+  if ALL_PRODUCTS_BODY["version"] != version:
+    ALL_PRODUCTS_BODY["body"] = to_json([dict(product) for product in PRODUCTS])
+    ALL_PRODUCTS_BODY["version"] = version
+  return ALL_PRODUCTS_BODY["body"]
+
+# Serialized single product, the version is part of the key so old entries are never served
+@lru_cache(maxsize=10_000)
+def product_body(product_id: int, version: int) -> bytes:
+  return to_json(dict(PRODUCTS.get(product_id)))
 
 # GET Request
 ## Read or Fetch All Data
+# /product                     -> all products (JSON list)
+# /product?limit=50            -> first page, next page cursor in the X-Next-Cursor header
+# /product?limit=50&cursor=... -> next page
+# /product?format=ndjson       -> streamed export
 @app.get("/product")
-async def all_products():
-  return PRODUCTS
+async def all_products(
+  response: Response,
+  limit: Annotated[int | None, Query(ge=1, le=1000)] = None,
+  cursor: Annotated[str | None, Query(description="X-Next-Cursor of the previous page")] = None,
+  format: Annotated[Literal["json", "ndjson"], Query()] = "json",
+  if_none_match: Annotated[str | None, Header()] = None
+  ):
+  after = decode_cursor(cursor) if cursor else None
+  if format == "ndjson":
+    return StreamingResponse(stream_products(after, limit), media_type="application/x-ndjson")
+  version = PRODUCTS.version
+  if limit is None and after is None:
+    etag = f'"catalog-{version}"'
+    if etag_matches(if_none_match, etag):
+      return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=all_products_body(version), media_type="application/json", headers={"ETag": etag})
+  etag = f'"catalog-{version}-{cursor or ""}-{limit}"'
+  if etag_matches(if_none_match, etag):
+    return Response(status_code=304, headers={"ETag": etag})
+  products, next_seq = PRODUCTS.page(after, limit or 100)
+  response.headers["ETag"] = etag
+  if next_seq is not None:
+    response.headers["X-Next-Cursor"] = encode_cursor(next_seq)
+  return products
 
 ## Read or Fetch Single Data
 @app.get("/product/{product_id}")
-async def single_products(product_id:int):
-  for product in PRODUCTS:
-    if product["id"] == product_id:
-      return product
+async def single_products(product_id:int, if_none_match: Annotated[str | None, Header()] = None):
+  version = PRODUCTS.item_version(product_id)
+  if version is None:
+    return None
+  etag = f'"{product_id}-{version}"'
+  if etag_matches(if_none_match, etag):
+    return Response(status_code=304, headers={"ETag": etag})
+  return Response(content=product_body(product_id, version), media_type="application/json", headers={"ETag": etag})
   
+# A new product needs an integer id (64-bit, see persistence.py), the other fields are kept as sent
+class Product(BaseModel):
+  model_config = {"extra": "allow"}
+  id: int = Field(ge=MIN_ID, le=MAX_ID)
+
 # POST Request
 ## Create or Insert Data
 @app.post("/product")
-async def create_product(new_product: dict):
-  PRODUCTS.append(new_product)
+async def create_product(product: Product):
+  new_product = product.model_dump()
+  PRODUCTS.add(new_product)
   return {"status":"created", "new_product":new_product}
 
 # PUT Request
 ## Update Complete Data
 @app.put("/product/{product_id}")
 def update_product(product_id: int, new_updated_product: dict):
-  for index, product in enumerate(PRODUCTS):
-    if product["id"] == product_id:
-      PRODUCTS[index] = new_updated_product
-      return {"status": "Updated", "product_id": product_id, "new updated product": new_updated_product}
+  if PRODUCTS.replace(product_id, new_updated_product) is not None:
+    return {"status": "Updated", "product_id": product_id, "new updated product": new_updated_product}
 
 
 # PATCH Request
 ## Update Partial Data
 @app.patch("/product/{product_id}")
 def partial_product(product_id: int, new_updated_product: dict):
-    for product in PRODUCTS:
-        if product["id"] == product_id:
-            product.update(new_updated_product)
-            return {"status": "Partial updated", "product_id": product_id, "new updated product": product}
+    product = PRODUCTS.update(product_id, new_updated_product)
+    if product is not None:
+        return {"status": "Partial updated", "product_id": product_id, "new updated product": product}
         
 # DELETE Request
 ## Delete Data
 @app.delete("/product/{product_id}")
 def delete_product(product_id: int):
-    for index, product in enumerate(PRODUCTS):
-        if product["id"] == product_id:
-            PRODUCTS.pop(index)
-            return {"status": "Deleted", "product_id": product_id}
\ No newline at end of file
+    if PRODUCTS.delete(product_id) is not None:
+        return {"status": "Deleted", "product_id": product_id}
+
+# Bulk Request
+## Create / Update / Delete many products in one request
+# Body: a JSON list of operations (see bulk.py), or the same operations as
+# NDJSON (Content-Type: application/x-ndjson, one operation per line).
+# Every operation gets its own result, invalid ones don't stop the others.
+# Parsing and applying a large batch takes a while, so it runs in a worker thread
+# and the event loop keeps serving other requests meanwhile.
+@app.post("/product/bulk")
+async def bulk_products(request: Request):
+    body = await request.body()
+    ndjson = request.headers.get("content-type", "").startswith("application/x-ndjson")
+    return await run_in_threadpool(run_bulk, body, ndjson)
+
+def run_bulk(body: bytes, ndjson: bool):
+    if ndjson:
+        parsed = parse_lines(body)
+    else:
+        try:
+            parsed = parse_operations(body)
+        except ValidationError as exc:
+            raise RequestValidationError(exc.errors(include_url=False, include_input=False))
+    results = apply_operations(PRODUCTS, parsed)
+    failed = sum(1 for result in results if result["status"] in ("Invalid", "Not found"))
+    return {"total": len(results), "succeeded": len(results) - failed, "failed": failed, "results": results}
\ No newline at end of file
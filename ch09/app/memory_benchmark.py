@@ -0,0 +1,44 @@
+# Benchmark: memory per product, plain dicts vs ProductRecord
+# Run: python app/memory_benchmark.py
+import gc
+import json
+import os
+import tempfile
+import tracemalloc
+
+# only the sample products are used, opened from a temp store instead of data/
+DATA_DIR = tempfile.TemporaryDirectory()
+os.environ["PRODUCTS_DIR"] = DATA_DIR.name
+
+from main import PRODUCTS  # noqa: E402
+from records import ProductRecord  # noqa: E402
+
+SIZE = 1_000_000
+
+# one JSON document per product, as if the catalog was loaded from a file / API
+TEMPLATES = [
+    json.dumps({**product, "id": 0, "title": "PLACEHOLDER"}).replace('0, "title": "PLACEHOLDER"', '%d, "title": "Product %d"')
+    for product in PRODUCTS
+]
+PRODUCTS.close()
+DATA_DIR.cleanup()
+
+
+def load(size):
+    for i in range(size):
+        yield json.loads(TEMPLATES[i % len(TEMPLATES)] % (i, i))
+
+
+def measure(label, build):
+    gc.collect()
+    tracemalloc.start()
+    catalog = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label}: {current / SIZE:7.0f} bytes / product ({current / 2**20:7.0f} MiB for {SIZE})")
+    return current
+
+
+before = measure("list of dicts        ", lambda: list(load(SIZE)))
+after = measure("list of ProductRecord", lambda: [ProductRecord(product) for product in load(SIZE)])
+print(f"saved {1 - after / before:.0%}")
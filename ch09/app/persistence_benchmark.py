@@ -0,0 +1,61 @@
+# Benchmark: startup time and write overhead of the persistent store at 1M products
+# Run: python app/persistence_benchmark.py
+import json
+import os
+import tempfile
+import time
+
+from store import ProductStore
+
+SIZE = 1_000_000
+WRITES = 20_000
+FSYNC_WRITES = 200
+
+products = [
+    {"id": i, "title": f"Product {i}", "price": 9.99, "description": "Slim-fitting style, contrast raglan long sleeve, light weight & soft fabric."}
+    for i in range(1, SIZE + 1)
+]
+
+with tempfile.TemporaryDirectory() as directory:
+    json_path = os.path.join(directory, "products.json")
+    with open(json_path, "w") as file:
+        json.dump(products, file)
+
+    data_dir = os.path.join(directory, "data")
+    store = ProductStore.open(data_dir, compact_every=None)
+    # bulk load without logging every product, then write one snapshot
+    journal, store._journal = store._journal, None
+    for product in products:
+        store.add(product)
+    store._journal = journal
+    start = time.perf_counter()
+    store.compact()
+    print(f"write snapshot          : {time.perf_counter() - start:6.2f} s")
+    store.close()
+    del products
+
+    start = time.perf_counter()
+    with open(json_path) as file:
+        ProductStore(json.load(file))
+    print(f"startup from JSON       : {time.perf_counter() - start:6.2f} s")
+
+    start = time.perf_counter()
+    store = ProductStore.open(data_dir, compact_every=None)
+    print(f"startup from snapshot   : {time.perf_counter() - start:6.2f} s ({len(store)} products)")
+
+    def patch_time(count, price):
+        start = time.perf_counter()
+        for i in range(1, count + 1):
+            store.update(i, {"price": price})
+        return (time.perf_counter() - start) / count * 1e6
+
+    # decode the products used below, so both runs measure only the write
+    for i in range(1, WRITES + 1):
+        store.get(i)
+    journal, store._journal = store._journal, None
+    print(f"PATCH, memory only      : {patch_time(WRITES, 19.99):6.1f} µs / op")
+    store._journal = journal
+    print(f"PATCH, change log       : {patch_time(WRITES, 29.99):6.1f} µs / op")
+    store._journal.fsync = True
+    print(f"PATCH, change log + fsync: {patch_time(FSYNC_WRITES, 39.99):6.1f} µs / op")
+    store.close()
@@ -0,0 +1,180 @@
+import json
+import mmap
+import os
+import shutil
+import struct
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from records import ProductRecord
+
+## Change log
+# Every write is appended as one binary entry: header (op, payload length, crc32) + JSON payload.
+# An entry cut short by a crash fails its length / crc check and is dropped at replay.
+OP_ADD, OP_REPLACE, OP_UPDATE, OP_DELETE = 1, 2, 3, 4
+ENTRY_HEADER = struct.Struct("<BII")
+# one shared encoder, json.dumps(..., separators=...) would build a new one per call
+ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+
+class ChangeLog:
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self.entries = 0
+        self._file = open(path, "ab")
+
+    def append(self, op: int, product_id, data=None):
+        payload = ENCODER.encode([product_id, data]).encode()
+        self._file.write(ENTRY_HEADER.pack(op, len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.entries += 1
+
+    # Start a new, empty log; the current entries move to `old_path` until they are part
+    # of a snapshot. If `old_path` is still there (a compaction failed), they are appended to it.
+    def rotate(self, old_path: str):
+        self._file.close()
+        if os.path.exists(old_path):
+            with open(self.path, "rb") as current, open(old_path, "ab") as old:
+                shutil.copyfileobj(current, old)
+            os.remove(self.path)
+        else:
+            os.replace(self.path, old_path)
+        self._file = open(self.path, "ab")
+        self.entries = 0
+
+    def close(self):
+        self._file.close()
+
+
+# Read all valid entries as (op, product_id, data) and cut off a damaged tail
+def read_log(path: str):
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as file:
+        data = file.read()
+    entries = []
+    offset = 0
+    while offset + ENTRY_HEADER.size <= len(data):
+        op, length, crc = ENTRY_HEADER.unpack_from(data, offset)
+        start = offset + ENTRY_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        product_id, fields = json.loads(payload)
+        entries.append((op, product_id, fields))
+        offset = start + length
+    if offset < len(data):
+        with open(path, "r+b") as file:
+            file.truncate(offset)
+    return entries
+
+
+## Snapshot
+# header | product JSON blobs | index (one fixed size row per product)
+# Opening a snapshot maps the file and reads only the index; a product's JSON
+# is decoded the first time that product is used (see LazyProduct).
+SNAPSHOT_MAGIC = b"PRODSNP1"
+SNAPSHOT_HEADER = struct.Struct("<8sQQQQ")  # magic, count, catalog version, next sequence, index offset
+INDEX_ROW = struct.Struct("<qQQQI")  # product id, sequence, item version, blob offset, blob length
+# product ids have to fit in the index row ("q")
+MIN_ID, MAX_ID = -2**63, 2**63 - 1
+
+
+# The file is mapped once, when the snapshot is opened: a compaction later replaces the
+# file at `path`, and products still pointing into this snapshot keep reading the old
+# mapping. It is unmapped when the last of them is gone (or by close(), at shutdown).
+class Snapshot:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def header(self):
+        magic, count, version, next_seq, index_offset = SNAPSHOT_HEADER.unpack_from(self._map, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{self.path} is not a product snapshot")
+        return count, version, next_seq, index_offset
+
+    # (product_id, seq, item_version, offset, length) for every product, in catalog order
+    def index(self):
+        count, _, _, index_offset = self.header()
+        end = index_offset + count * INDEX_ROW.size
+        return INDEX_ROW.iter_unpack(self._map[index_offset:end])
+
+    def raw(self, offset: int, length: int) -> bytes:
+        return self._map[offset:offset + length]
+
+    def close(self):
+        self._map.close()
+
+
+class LazyProduct:
+    __slots__ = ("snapshot", "offset", "length")
+
+    def __init__(self, snapshot: Snapshot, offset: int, length: int):
+        self.snapshot = snapshot
+        self.offset = offset
+        self.length = length
+
+    def raw(self) -> bytes:
+        return self.snapshot.raw(self.offset, self.length)
+
+    def load(self) -> ProductRecord:
+        return ProductRecord(json.loads(self.raw()))
+
+
+# rows: (product_id, seq, item_version, product) in catalog order, product is a
+# ProductRecord or a LazyProduct (copied as raw bytes, without decoding it).
+# Writes to a temp file and returns it with the (offset, length) of every row.
+def write_snapshot(path: str, rows, version: int, next_seq: int):
+    tmp_path = path + ".tmp"
+    index = bytearray()
+    locations = []
+    count = 0
+    try:
+        with open(tmp_path, "wb") as file:
+            file.write(b"\0" * SNAPSHOT_HEADER.size)
+            offset = SNAPSHOT_HEADER.size
+            for product_id, seq, item_version, product in rows:
+                if isinstance(product, LazyProduct):
+                    blob = product.raw()
+                else:
+                    blob = ENCODER.encode(dict(product)).encode()
+                file.write(blob)
+                index += INDEX_ROW.pack(product_id, seq, item_version, offset, len(blob))
+                locations.append((offset, len(blob)))
+                offset += len(blob)
+                count += 1
+            file.write(index)
+            file.seek(0)
+            file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, count, version, next_seq, offset))
+            file.flush()
+            os.fsync(file.fileno())
+    except BaseException:
+        # no half written snapshot is left behind
+        os.remove(tmp_path)
+        raise
+    return tmp_path, locations
+
+
+# One writer per data directory: a second process (another worker) opening the same
+# directory would append to the same log and compact over the first one's writes
+def lock_directory(directory: str):
+    file = open(os.path.join(directory, "lock"), "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        file.close()
+        raise RuntimeError(f"{directory} is already used by another process (one writer per data directory)") from None
+    return file
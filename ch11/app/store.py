@@ -0,0 +1,269 @@
+from bisect import bisect_right
+import os
+import threading
+
+from persistence import (
+    MAX_ID, MIN_ID, OP_ADD, OP_DELETE, OP_REPLACE, OP_UPDATE,
+    ChangeLog, LazyProduct, Snapshot, lock_directory, read_log, write_snapshot,
+)
+from records import ProductRecord
+
+
+# In-memory product store
+# A dict keeps insertion order (Python 3.7+), so one id -> record dict gives
+# O(1) lookup / update / delete and still lists products in the order they were added.
+class ProductStore:
+    def __init__(self, products=None):
+        self._products = {}
+        # Every new product gets an increasing sequence number, kept in two parallel
+        # lists (sorted by sequence). A page cursor is the last sequence number seen,
+        # so the next page starts with a bisect instead of skipping over earlier items.
+        self._seq_of = {}
+        self._seqs = []
+        self._ids = []
+        self._next_seq = 1
+        self._deleted = 0
+        # Catalog version, bumped by every write. Each product remembers the catalog
+        # version of its last change, which makes a per-item version that is never reused.
+        self.version = 0
+        self._versions = {}
+        # Persistence (see open()), writes are logged only when a journal is set
+        self._lock = threading.RLock()
+        self._journal = None
+        self._snapshot = None
+        self._snapshot_path = None
+        self._old_log_path = None
+        self._dir_lock = None
+        # at most one compaction at a time; the one started by a write runs in self._compactor
+        self._compacting = threading.Lock()
+        self._compactor = None
+        self.compact_every = None
+        for product in products or []:
+            self.add(product)
+
+    # Durable store in `directory`: products.snapshot (memory-mapped) + products.log
+    # (every write since that snapshot). `default` products are added to a new, empty store.
+    # Only one process can have a directory open (RuntimeError otherwise), so run a single
+    # worker per data directory.
+    @classmethod
+    def open(cls, directory, default=(), fsync=False, compact_every=100_000):
+        os.makedirs(directory, exist_ok=True)
+        store = cls()
+        store._dir_lock = lock_directory(directory)
+        store._snapshot_path = os.path.join(directory, "products.snapshot")
+        store._old_log_path = os.path.join(directory, "products.log.old")
+        log_path = os.path.join(directory, "products.log")
+        has_snapshot = os.path.exists(store._snapshot_path)
+        if has_snapshot:
+            store._load_snapshot(Snapshot(store._snapshot_path))
+        # products.log.old: writes of a compaction that didn't finish
+        entries = read_log(store._old_log_path) + read_log(log_path)
+        for op, product_id, data in entries:
+            store._apply(op, product_id, data)
+        store._journal = ChangeLog(log_path, fsync=fsync)
+        store._journal.entries = len(entries)
+        store.compact_every = compact_every
+        if not has_snapshot and not entries:
+            for product in default:
+                store.add(product)
+        return store
+
+    def _load_snapshot(self, snapshot):
+        _, self.version, self._next_seq, _ = snapshot.header()
+        for product_id, seq, item_version, offset, length in snapshot.index():
+            self._products[product_id] = LazyProduct(snapshot, offset, length)
+            self._seq_of[product_id] = seq
+            self._seqs.append(seq)
+            self._ids.append(product_id)
+            self._versions[product_id] = item_version
+        self._snapshot = snapshot
+
+    def _apply(self, op, product_id, data):
+        if op == OP_ADD:
+            self.add(data)
+        elif op == OP_REPLACE:
+            self.replace(product_id, data)
+        elif op == OP_UPDATE:
+            self.update(product_id, data)
+        elif op == OP_DELETE:
+            self.delete(product_id)
+
+    def _log(self, op, product_id, data=None):
+        if self._journal is None:
+            return
+        self._journal.append(op, product_id, data)
+        if self.compact_every and self._journal.entries >= self.compact_every:
+            # off the request path: the write returns, the snapshot is written by a thread
+            if self._compactor is None or not self._compactor.is_alive():
+                self._compactor = threading.Thread(target=self.compact, name="product-compaction", daemon=True)
+                self._compactor.start()
+
+    # Write the whole catalog into a new snapshot and empty the log.
+    # The lock is held only to take a copy of the catalog (and move the log aside) and to
+    # swap in the new snapshot; writes go on while the snapshot is written. Products still
+    # only in the old snapshot are copied as raw bytes; afterwards every product that didn't
+    # change in the meantime points into the new snapshot, so decoded products are released.
+    def compact(self):
+        if self._journal is None:
+            return
+        with self._compacting:
+            with self._lock:
+                rows = [
+                    (product_id, self._seq_of[product_id], self._versions[product_id], product)
+                    for product_id, product in self._products.items()
+                ]
+                version, next_seq = self.version, self._next_seq
+                # later writes go to a new log, the snapshot covers everything in the old one
+                self._journal.rotate(self._old_log_path)
+            # records are never changed in place (see update()), so the rows stay as copied
+            tmp_path, locations = write_snapshot(self._snapshot_path, rows, version, next_seq)
+            with self._lock:
+                os.replace(tmp_path, self._snapshot_path)
+                snapshot = Snapshot(self._snapshot_path)
+                for (product_id, _, item_version, _), (offset, length) in zip(rows, locations):
+                    if self._versions.get(product_id) == item_version:
+                        self._products[product_id] = LazyProduct(snapshot, offset, length)
+                live = [(s, i) for s, i in zip(self._seqs, self._ids) if self._seq_of.get(i) == s]
+                self._seqs = [s for s, _ in live]
+                self._ids = [i for _, i in live]
+                self._deleted = 0
+                # not closed here: readers may still hold products from the old snapshot,
+                # its mapping is released once the last of them is dropped
+                self._snapshot = snapshot
+            # a crash before this line only replays writes that are already in the snapshot
+            os.remove(self._old_log_path)
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor.join()
+        if self._journal is not None:
+            self._journal.close()
+        if self._snapshot is not None:
+            self._snapshot.close()
+        if self._dir_lock is not None:
+            self._dir_lock.close()
+
+    # Products loaded from a snapshot are decoded on first use
+    # The decoded record is kept only if the product wasn't written (or moved to a new
+    # snapshot) while it was decoded, otherwise it would overwrite the newer record.
+    def _resolve(self, product_id, product):
+        if isinstance(product, LazyProduct):
+            loaded = product.load()
+            with self._lock:
+                if self._products.get(product_id) is product:
+                    self._products[product_id] = loaded
+            product = loaded
+        return product
+
+    def __len__(self):
+        return len(self._products)
+
+    def __iter__(self):
+        for product_id, product in self._products.items():
+            yield self._resolve(product_id, product)
+
+    def __contains__(self, product_id):
+        return product_id in self._products
+
+    # Read all products (insertion order)
+    def all(self):
+        return list(self)
+
+    # Read up to `limit` products added after cursor `after` (None = from the start)
+    # Returns the products and the cursor of the next page (None on the last page)
+    def page(self, after=None, limit=100):
+        # local references: a compaction swaps in new lists instead of editing these
+        seqs, ids = self._seqs, self._ids
+        index = 0 if after is None else bisect_right(seqs, after)
+        items = []
+        last_seq = None
+        while index < len(seqs):
+            seq, product_id = seqs[index], ids[index]
+            index += 1
+            product = self._products.get(product_id)
+            # skip deleted products
+            if product is None or self._seq_of.get(product_id) != seq:
+                continue
+            if len(items) == limit:
+                return items, last_seq
+            items.append(self._resolve(product_id, product))
+            last_seq = seq
+        return items, None
+
+    # Read single product
+    def get(self, product_id):
+        product = self._products.get(product_id)
+        if product is None:
+            return None
+        return self._resolve(product_id, product)
+
+    def item_version(self, product_id):
+        return self._versions.get(product_id)
+
+    def _changed(self, product_id):
+        self.version += 1
+        self._versions[product_id] = self.version
+
+    # Create product
+    def add(self, product):
+        product = ProductRecord(product)
+        product_id = product["id"]
+        # the id is a key of the snapshot index (a signed 64-bit integer there)
+        if type(product_id) is not int or not MIN_ID <= product_id <= MAX_ID:
+            raise ValueError(f"product id must be an integer between {MIN_ID} and {MAX_ID}, got {product_id!r}")
+        with self._lock:
+            if product_id not in self._seq_of:
+                self._seq_of[product_id] = self._next_seq
+                self._seqs.append(self._next_seq)
+                self._ids.append(product_id)
+                self._next_seq += 1
+            self._products[product_id] = product
+            self._changed(product_id)
+            self._log(OP_ADD, product_id, dict(product))
+        return product
+
+    # Replace complete product, keeps its position
+    def replace(self, product_id, product):
+        with self._lock:
+            if product_id not in self._products:
+                return None
+            product = ProductRecord(product)
+            self._products[product_id] = product
+            self._changed(product_id)
+            self._log(OP_REPLACE, product_id, dict(product))
+        return product
+
+    # Update only the given fields
+    # The record is copied, not changed in place: a running compaction may be encoding it
+    def update(self, product_id, fields):
+        with self._lock:
+            product = self.get(product_id)
+            if product is None:
+                return None
+            product = ProductRecord(product)
+            product.update(fields)
+            self._products[product_id] = product
+            self._changed(product_id)
+            self._log(OP_UPDATE, product_id, fields)
+        return product
+
+    # Delete product
+    def delete(self, product_id):
+        with self._lock:
+            product = self._products.pop(product_id, None)
+            if product is None:
+                return None
+            if isinstance(product, LazyProduct):
+                product = product.load()
+            del self._seq_of[product_id]
+            del self._versions[product_id]
+            self.version += 1
+            self._deleted += 1
+            # drop deleted entries once they are half of the sequence lists
+            if self._deleted * 2 > len(self._seqs):
+                live = [(s, i) for s, i in zip(self._seqs, self._ids) if self._seq_of.get(i) == s]
+                self._seqs = [s for s, _ in live]
+                self._ids = [i for _, i in live]
+                self._deleted = 0
+            self._log(OP_DELETE, product_id)
+        return product
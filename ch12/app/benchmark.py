@@ -0,0 +1,53 @@
+# Benchmark: fuzzy search through the trigram index vs a naive Levenshtein scan
+# Run: python app/benchmark.py
+import random
+import string
+import time
+
+from search import ProductIndex, levenshtein, tokenize
+
+TITLES = 100_000
+VOCABULARY = 20_000
+QUERIES = 5
+MAX_DISTANCE = 2
+
+random.seed(42)
+words = ["".join(random.choices(string.ascii_lowercase, k=random.randint(5, 9))) for _ in range(VOCABULARY)]
+products = [
+    {"id": i, "title": " ".join(random.sample(words, 3)), "price": 9.99}
+    for i in range(1, TITLES + 1)
+]
+
+
+def typo(word):
+    index = random.randrange(len(word))
+    return word[:index] + random.choice(string.ascii_lowercase) + word[index + 1:]
+
+
+queries = [typo(random.choice(words)) for _ in range(QUERIES)]
+
+
+def naive_search(query):
+    matches = []
+    for product in products:
+        distance = min(levenshtein(query, word, MAX_DISTANCE) for word in tokenize(product["title"]))
+        if distance <= MAX_DISTANCE:
+            matches.append((distance, product["id"]))
+    return [product_id for _, product_id in sorted(matches)]
+
+
+start = time.perf_counter()
+index = ProductIndex(products)
+print(f"build index ({TITLES} titles): {time.perf_counter() - start:.2f} s")
+
+start = time.perf_counter()
+naive = [naive_search(query) for query in queries]
+naive_time = (time.perf_counter() - start) / QUERIES
+
+start = time.perf_counter()
+indexed = [[p["id"] for p in index.fuzzy_search([query], MAX_DISTANCE)] for query in queries]
+indexed_time = (time.perf_counter() - start) / QUERIES
+
+assert naive == indexed
+print(f"naive scan : {naive_time * 1000:8.2f} ms / query")
+print(f"trigrams   : {indexed_time * 1000:8.2f} ms / query ({naive_time / indexed_time:.0f}x faster)")
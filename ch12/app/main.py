@@ -1,6 +1,7 @@
 from fastapi import FastAPI, Query
-from typing import Annotated
-from pydantic import AfterValidator
+from typing import Annotated, Literal
+from pydantic import AfterValidator, BaseModel
+from search import ProductIndex
 
 app = FastAPI()
 
@@ -120,6 +121,75 @@ PRODUCTS = [
 #     return PRODUCTS
 
 
+## Inverted index search
+# Titles are tokenized once into SEARCH_INDEX (token -> product ids) and kept
+# up to date by the create / update / delete routes below, so a search never scans the catalog.
+SEARCH_INDEX = ProductIndex(PRODUCTS)
+
+# Autocomplete (declared before any /products/{...} route)
+@app.get("/products/suggest")
+async def suggest_products(
+    q: Annotated[str, Query(min_length=1, description="Partial title, the last word is completed")],
+    limit: Annotated[int, Query(ge=1, le=50)] = 10
+    ):
+    return SEARCH_INDEX.suggest(q, limit)
+
+@app.get("/products")
+async def get_products(
+    search: Annotated[
+        list[str] | None,
+        Query(alias="q", title="Search Products", description="Search by product title")
+    ] = None,
+    match: Annotated[Literal["all", "any"], Query(description="all = AND, any = OR")] = "all",
+    prefix: Annotated[bool, Query(description="Match words that start with the term")] = True,
+    fuzzy: Annotated[bool, Query(description="Allow typos, results ranked by similarity")] = False,
+    max_distance: Annotated[int, Query(ge=0, le=3, description="Max edit distance per word (fuzzy mode)")] = 2
+    ):
+    if search and fuzzy:
+        return SEARCH_INDEX.fuzzy_search(search, max_distance)
+    if search:
+        return SEARCH_INDEX.search(search, match_all=match == "all", prefix=prefix)
+    return SEARCH_INDEX.all()
+
+# The index needs an integer id and a string title, other fields are kept as sent
+class Product(BaseModel):
+    model_config = {"extra": "allow"}
+    id: int
+    title: str
+
+# PUT body: the id comes from the path
+class ProductBody(BaseModel):
+    model_config = {"extra": "allow"}
+    title: str
+
+# PATCH body: only the fields that are sent are changed (exclude_unset),
+# so the title default is never used and an explicit null is a 422
+class ProductUpdate(BaseModel):
+    model_config = {"extra": "allow"}
+    title: str = None
+
+@app.post("/products")
+async def create_product(product: Product):
+    new_product = product.model_dump()
+    SEARCH_INDEX.add(new_product)
+    return {"status": "created", "new_product": new_product}
+
+@app.put("/products/{product_id}")
+async def update_product(product_id: int, new_updated_product: ProductBody):
+    if SEARCH_INDEX.get(product_id) is not None:
+        SEARCH_INDEX.add({**new_updated_product.model_dump(), "id": product_id})
+        return {"status": "Updated", "product_id": product_id}
+
+@app.patch("/products/{product_id}")
+async def partial_product(product_id: int, new_updated_product: ProductUpdate):
+    product = SEARCH_INDEX.update(product_id, new_updated_product.model_dump(exclude_unset=True))
+    if product is not None:
+        return {"status": "Partial updated", "product_id": product_id, "new updated product": product}
+
+@app.delete("/products/{product_id}")
+async def delete_product(product_id: int):
+    if SEARCH_INDEX.remove(product_id) is not None:
+        return {"status": "Deleted", "product_id": product_id}
 
 
 ## Custom Validation
@@ -0,0 +1,280 @@
+import re
+from itertools import islice
+
+from records import ProductRecord
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str):
+    return TOKEN_RE.findall(text.lower())
+
+
+# Prefix tree over the indexed tokens (used for prefix queries and autocomplete)
+class TrieNode:
+    __slots__ = ("children", "token")
+
+    def __init__(self):
+        self.children = {}
+        self.token = None
+
+
+class Trie:
+    def __init__(self):
+        self.root = TrieNode()
+
+    def insert(self, token: str):
+        node = self.root
+        for char in token:
+            node = node.children.setdefault(char, TrieNode())
+        node.token = token
+
+    def remove(self, token: str):
+        path = [self.root]
+        for char in token:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].token = None
+        # prune branches that no longer lead to a token
+        for depth in range(len(token), 0, -1):
+            node = path[depth]
+            if node.children or node.token:
+                break
+            del path[depth - 1].children[token[depth - 1]]
+
+    # Tokens starting with prefix, in alphabetical order, produced lazily
+    def completions(self, prefix: str):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.token:
+                yield node.token
+            # reversed so that tokens come out in alphabetical order
+            stack.extend(node.children[c] for c in sorted(node.children, reverse=True))
+
+    def starts_with(self, prefix: str, limit: int | None = None):
+        return list(islice(self.completions(prefix), limit))
+
+
+# Edit distance, stops early once every cell of a row is above max_distance
+def levenshtein(a: str, b: str, max_distance: int | None = None):
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+# Padded trigrams of a token, repeated trigrams are numbered so they count once each
+# "shirt" -> ("$$s", 0), ("$sh", 0), ("shi", 0), ("hir", 0), ("irt", 0), ("rt$", 0), ("t$$", 0)
+def trigrams(token: str):
+    padded = f"$${token}$$"
+    seen = {}
+    grams = []
+    for i in range(len(padded) - 2):
+        gram = padded[i:i + 3]
+        seen[gram] = seen.get(gram, -1) + 1
+        grams.append((gram, seen[gram]))
+    return grams
+
+
+# Trigram index over the indexed tokens (used for typo tolerant search)
+# Two words within edit distance k share at least max(len_a, len_b) + 2 - 3k trigrams,
+# so only words passing that count are checked with levenshtein().
+class TrigramIndex:
+    def __init__(self):
+        self.grams = {}
+        self.lengths = {}
+
+    def add(self, token: str):
+        for gram in trigrams(token):
+            self.grams.setdefault(gram, set()).add(token)
+        self.lengths.setdefault(len(token), set()).add(token)
+
+    def remove(self, token: str):
+        for gram in trigrams(token):
+            tokens = self.grams[gram]
+            tokens.discard(token)
+            if not tokens:
+                del self.grams[gram]
+        self.lengths[len(token)].discard(token)
+
+    def find(self, token: str, max_distance: int):
+        size = len(token)
+        shared = {}
+        for gram in trigrams(token):
+            for word in self.grams.get(gram, ()):
+                shared[word] = shared.get(word, 0) + 1
+        candidates = {
+            word for word, count in shared.items()
+            if abs(len(word) - size) <= max_distance
+            and count >= max(size, len(word)) + 2 - 3 * max_distance
+        }
+        # very short words may not need to share any trigram at all
+        for length in range(max(1, size - max_distance), size + max_distance + 1):
+            if max(size, length) + 2 - 3 * max_distance <= 0:
+                candidates |= self.lengths.get(length, set())
+        matches = []
+        for word in candidates:
+            distance = levenshtein(token, word, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, word))
+        return sorted(matches)
+
+
+# Inverted index: token -> ids of the products whose title contains it
+class ProductIndex:
+    def __init__(self, products=None):
+        self.products = {}
+        self.postings = {}
+        self.trie = Trie()
+        self.trigrams = TrigramIndex()
+        for product in products or []:
+            self.add(product)
+
+    def all(self):
+        return list(self.products.values())
+
+    def get(self, product_id):
+        return self.products.get(product_id)
+
+    def add(self, product):
+        product = ProductRecord(product)
+        # tokenized before anything changes, so a bad title leaves the index as it was
+        tokens = set(tokenize(product["title"]))
+        self.remove(product["id"])
+        self.products[product["id"]] = product
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                self.trie.insert(token)
+                self.trigrams.add(token)
+            ids.add(product["id"])
+        return product
+
+    def update(self, product_id, fields):
+        product = self.products.get(product_id)
+        if product is None:
+            return None
+        # the id is the key in the index, it can't be patched
+        fields = {key: value for key, value in fields.items() if key != "id"}
+        # only the title is indexed, other fields can change in place
+        if "title" in fields and fields["title"] != product["title"]:
+            # add() replaces the stored record only once the new title is tokenized
+            updated = ProductRecord(product)
+            updated.update(fields)
+            return self.add(updated)
+        product.update(fields)
+        return product
+
+    def remove(self, product_id):
+        product = self.products.pop(product_id, None)
+        if product is None:
+            return None
+        for token in set(tokenize(product["title"])):
+            ids = self.postings[token]
+            ids.discard(product_id)
+            if not ids:
+                del self.postings[token]
+                self.trie.remove(token)
+                self.trigrams.remove(token)
+        return product
+
+    # ids matching one term (exact token, or every token starting with it)
+    def _term_ids(self, term: str, prefix: bool):
+        if not prefix:
+            return set(self.postings.get(term, ()))
+        ids = set()
+        for token in self.trie.starts_with(term):
+            ids |= self.postings[token]
+        return ids
+
+    def search(self, terms: list[str], match_all: bool = True, prefix: bool = True):
+        tokens = [token for term in terms for token in tokenize(term)]
+        if not tokens:
+            return []
+        # smallest posting lists first, so AND queries shrink quickly
+        sets = sorted((self._term_ids(token, prefix) for token in tokens), key=len)
+        if match_all:
+            ids = sets[0].intersection(*sets[1:])
+        else:
+            ids = set().union(*sets)
+        # one entry per product, ordered by id
+        return [self.products[product_id] for product_id in sorted(ids)]
+
+    # Autocomplete: earlier words must match, the last word is a prefix
+    # Titles come out ordered by the completed word, then by id.
+    def suggest(self, query: str, limit: int = 10):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        *words, last = tokens
+        if words:
+            # the earlier words narrow the products first, then only their own
+            # tokens are checked against the prefix (completions are never cut short)
+            sets = sorted((self.postings.get(word, set()) for word in words), key=len)
+            ids = sets[0].intersection(*sets[1:])
+            matches = sorted(
+                (token, product_id)
+                for product_id in ids
+                for token in set(tokenize(self.products[product_id]["title"]))
+                if token.startswith(last)
+            )
+        else:
+            matches = (
+                (token, product_id)
+                for token in self.trie.completions(last)
+                for product_id in sorted(self.postings[token])
+            )
+        titles = []
+        seen = set()
+        for _, product_id in matches:
+            if product_id in seen:
+                continue
+            seen.add(product_id)
+            titles.append(self.products[product_id]["title"])
+            if len(titles) >= limit:
+                break
+        return titles
+
+    # Typo tolerant search: every query word must be within max_distance of a title word,
+    # products are ranked by the summed distance (closest first)
+    def fuzzy_search(self, terms: list[str], max_distance: int = 2):
+        tokens = [token for term in terms for token in tokenize(term)]
+        if not tokens:
+            return []
+        scores = None
+        for token in tokens:
+            best = {}
+            for distance, word in self.trigrams.find(token, max_distance):
+                for product_id in self.postings[word]:
+                    if distance < best.get(product_id, max_distance + 1):
+                        best[product_id] = distance
+            if scores is None:
+                scores = best
+            else:
+                scores = {i: scores[i] + d for i, d in best.items() if i in scores}
+            if not scores:
+                return []
+        ranked = sorted(scores, key=lambda product_id: (scores[product_id], product_id))
+        return [self.products[product_id] for product_id in ranked]
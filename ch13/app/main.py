@@ -1,12 +1,13 @@
 from fastapi import FastAPI, Path, Query
 from typing import Annotated
+from records import ProductRecord
 app = FastAPI()
 
-PRODUCTS = [
+PRODUCTS = [ProductRecord(product) for product in [
     {"id": 1, "title": "Ravan Backpack", "price": 109.95, "description": "Perfect for everyday use and forest walks."},
     {"id": 2, "title": "Slim Fit T-Shirts", "price": 22.3, "description": "Comfortable, slim-fitting casual shirts."},
     {"id": 3, "title": "Cotton Jacket", "price": 55.99, "description": "Great for outdoor activities and gifting."},
-]
+]]
 
 # # Basic Path Parameter
 @app.get("/products/{product_id}") 
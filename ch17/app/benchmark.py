@@ -0,0 +1,74 @@
+# Benchmark: POST /products/ingest with a large NDJSON body
+# The body is generated while it is sent (httpx passes it to the app chunk by chunk),
+# so neither side ever holds the whole file. Reports items/sec and the peak RSS of the process.
+# Ingested products are counted but not kept, so RSS shows the cost of the ingestion itself.
+# Run from the ch17 folder: python app/benchmark.py [products]
+import asyncio
+import resource
+import sys
+import time
+
+import httpx
+
+import main
+
+CHUNK_SIZE = 64 * 1024
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def ndjson_body(count, bad_every=1000):
+    chunk = []
+    size = 0
+    for i in range(count):
+        if i % bad_every == 0:
+            line = f'{{"name":"product {i}","price":-1}}\n'
+        else:
+            line = (
+                f'{{"name":"product {i}","price":{10 + i % 500}.5,"stock":{i % 100},'
+                f'"category":{{"name":"category {i % 20}","description":"imported"}}}}\n'
+            )
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(chunk).encode()
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk).encode()
+
+
+async def run(count):
+    stored = 0
+
+    def count_products(products):
+        nonlocal stored
+        stored += len(products)
+
+    main.save_products = count_products
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        # body generation is timed separately, so it can be subtracted
+        start = time.perf_counter()
+        async for _ in ndjson_body(count):
+            pass
+        generate = time.perf_counter() - start
+
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        response = await client.post("/products/ingest", content=ndjson_body(count))
+        elapsed = time.perf_counter() - start
+    result = response.json()
+    assert result["accepted"] == stored
+    ingest = elapsed - generate
+    print(f"products      {count:,}")
+    print(f"accepted      {result['accepted']:,}  failed {result['failed']:,}")
+    print(f"time          {elapsed:.2f} s ({generate:.2f} s generating the body)")
+    print(f"throughput    {count / ingest:,.0f} items/sec")
+    print(f"peak RSS      {peak_rss_mb():.0f} MB (before the request {rss_before:.0f} MB)")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000))
@@ -1,5 +1,5 @@
-from fastapi import FastAPI
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 
 app = FastAPI()
 
@@ -48,6 +48,101 @@ class Product(BaseModel):
 async def create_product(product: Product):
     return product
 
+# ## Streaming NDJSON ingestion
+# One product per line. The body is read chunk by chunk, complete lines are collected
+# into batches of INGEST_BATCH_SIZE and each batch is validated with one call to
+# TypeAdapter(list[Product]) (the lines are joined into a JSON array, parsed in pydantic-core).
+# Only when a batch fails are its lines validated one by one, so a bad line is reported
+# with its line number and the other lines of the batch are still ingested.
+# A line longer than MAX_LINE_BYTES (or a body without newlines) stops the import with a 413,
+# the partial line is the only part of the body that has to be kept in memory.
+INGEST_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+MAX_LINE_BYTES = 1024 * 1024
+PRODUCT_LIST = TypeAdapter(list[Product])
+PRODUCTS: list[Product] = []
+
+
+def save_products(products: list[Product]):
+    PRODUCTS.extend(products)
+
+
+def validate_lines(lines):
+    products, errors = [], []
+    for number, line in lines:
+        try:
+            products.append((number, Product.model_validate_json(line)))
+        except ValidationError as exc:
+            errors.append((number, exc.errors(include_url=False, include_input=False)))
+    return products, errors
+
+
+# lines: [(line_number, raw_line)] -> ([(line_number, product)], [(line_number, errors)])
+def validate_batch(lines, retry=True):
+    suspects = None
+    try:
+        products = PRODUCT_LIST.validate_json(b"[" + b",".join(line for _, line in lines) + b"]")
+        # a line like `{...},{...}` would add two items and shift every index after it
+        if len(products) == len(lines):
+            return [(number, product) for (number, _), product in zip(lines, products)], []
+    except ValidationError as exc:
+        # errors are reported per array index: only those lines are checked one by one,
+        # the rest is validated again as one batch (invalid JSON has no index -> every line)
+        locations = [error["loc"] for error in exc.errors()]
+        if retry and all(loc and isinstance(loc[0], int) for loc in locations):
+            suspects = {loc[0] for loc in locations if loc[0] < len(lines)}
+    if not suspects or len(suspects) == len(lines):
+        return validate_lines(lines)
+    good, errors = validate_batch([line for i, line in enumerate(lines) if i not in suspects], retry=False)
+    checked, suspect_errors = validate_lines([lines[i] for i in sorted(suspects)])
+    return sorted(good + checked, key=lambda item: item[0]), sorted(errors + suspect_errors, key=lambda item: item[0])
+
+
+@app.post("/products/ingest")
+async def ingest_products(request: Request):
+    accepted = failed = 0
+    errors = []
+    batch = []
+    buffer = b""
+    number = 0
+
+    def flush():
+        nonlocal accepted, failed
+        products, batch_errors = validate_batch(batch)
+        save_products([product for _, product in products])
+        accepted += len(products)
+        failed += len(batch_errors)
+        for line_number, line_errors in batch_errors:
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"line": line_number, "errors": line_errors})
+        batch.clear()
+
+    def line_too_long(line_number):
+        return HTTPException(
+            status_code=413,
+            detail=f"line {line_number} is longer than {MAX_LINE_BYTES} bytes ({accepted} products were ingested before it)",
+        )
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > MAX_LINE_BYTES:
+            raise line_too_long(number + len(lines) + 1)
+        for line in lines:
+            number += 1
+            if len(line) > MAX_LINE_BYTES:
+                raise line_too_long(number)
+            if line.strip():
+                batch.append((number, line))
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    flush()
+    # last line without a trailing newline
+    if buffer.strip():
+        batch.append((number + 1, buffer))
+    if batch:
+        flush()
+    return {"accepted": accepted, "failed": failed, "errors": errors}
+
 # # ## Attributes with lists of submodels
 # class Category(BaseModel):
 #     name: str = Field(
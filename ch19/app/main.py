@@ -1,11 +1,52 @@
 from fastapi import FastAPI, Cookie
-from typing import Annotated
+from pydantic import BaseModel, Field
+from typing import Annotated, Literal
+
+from cache import TTLCache
+from catalog import CATALOG
+from recommender import CoOccurrenceRecommender
 
 app = FastAPI()
 
-@app.get("/products/recommendations")
-async def get_recommendations(session_id : Annotated[str | None,Cookie()] = None):
+# @app.get("/products/recommendations")
+# async def get_recommendations(session_id : Annotated[str | None,Cookie()] = None):
+#     if session_id:
+#         return {"message":f"Recomendations for session {session_id}","session_id" : session_id}
+#     else:
+#         return {"message":f"No session_id provided,showing default recommendations"}
+
+class ProductEvent(BaseModel):
+    product_id: int = Field(title="Product ID", description="Viewed or purchased product")
+    event: Literal["view", "purchase"] = Field(default="view", title="Event", description="Kind of interaction")
+
+# Item-to-item recommendations learned from the events (see app/recommender.py)
+RECOMMENDER = CoOccurrenceRecommender(CATALOG)
+
+@app.post("/products/events")
+async def record_events(session_id : Annotated[str,Cookie()], events : list[ProductEvent]):
+    unknown = [e.product_id for e in events if not RECOMMENDER.record(session_id, e.product_id, e.event)]
+    return {"session_id" : session_id, "recorded" : len(events) - len(unknown), "unknown_products" : unknown}
+
+# Recommendations are cached per session for RECOMMENDATIONS_TTL seconds
+# (requests without a session share the default entry, key None);
+# the session's event count is part of the key, so a new event is reflected right away
+RECOMMENDATIONS_TTL = 60
+RECOMMENDATIONS_CACHE = TTLCache(maxsize=10_000, ttl=RECOMMENDATIONS_TTL)
+
+def build_recommendations(session_id: str | None, limit: int = 10):
     if session_id:
-        return {"message":f"Recomendations for session {session_id}","session_id" : session_id}
+        _, recommended, products = RECOMMENDER.page(session_id, limit=limit)
+        return {"message":f"Recomendations for session {session_id}","session_id" : session_id,
+                "recommended" : recommended, "products" : products}
     else:
-        return {"message":f"No session_id provided,showing default recommendations"}
+        _, products = CATALOG.filter(limit=limit)
+        return {"message":f"No session_id provided,showing default recommendations", "products" : products}
+
+@app.get("/products/recommendations")
+async def get_recommendations(session_id : Annotated[str | None,Cookie()] = None):
+    key = (session_id, RECOMMENDER.session_version(session_id)) if session_id else None
+    return await RECOMMENDATIONS_CACHE.get_or_compute(key, lambda: build_recommendations(session_id))
+
+@app.get("/products/recommendations/cache")
+async def recommendations_cache_stats():
+    return RECOMMENDATIONS_CACHE.stats()
@@ -0,0 +1,38 @@
+# Benchmark: price range + category filtering over 1M products
+# Run: python app/benchmark.py
+import random
+import time
+
+from catalog import ProductColumns
+
+SIZE = 1_000_000
+QUERIES = 1_000
+CATEGORIES = ["books", "clothing", "electronics"]
+
+random.seed(42)
+products = [
+    {"id": i, "name": f"Product {i}", "price": round(random.uniform(1, 2000), 2), "category": random.choice(CATEGORIES)}
+    for i in range(1, SIZE + 1)
+]
+
+start = time.perf_counter()
+catalog = ProductColumns(products)
+print(f"build columns ({SIZE} products): {time.perf_counter() - start:.2f} s")
+
+for label, width, category in [
+    ("narrow range      ", 20, None),
+    ("narrow + category ", 20, "electronics"),
+    ("wide range        ", 1000, None),
+    ("wide + category   ", 1000, "books"),
+]:
+    ranges = [(low, low + width) for low in (random.uniform(1, 2000 - width) for _ in range(QUERIES))]
+    start = time.perf_counter()
+    for low, high in ranges:
+        catalog.filter(low, high, category, limit=20)
+    elapsed = (time.perf_counter() - start) / QUERIES
+    print(f"{label}: {elapsed * 1000:.3f} ms / query")
+
+# the same query as a Python loop over dicts, for comparison
+start = time.perf_counter()
+matches = [p for p in products if 500 <= p["price"] <= 1500 and p["category"] == "books"][:20]
+print(f"python loop       : {(time.perf_counter() - start) * 1000:.3f} ms / query")
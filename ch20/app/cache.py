@@ -0,0 +1,107 @@
+import asyncio
+import inspect
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+# In-process result cache
+# OrderedDict in least -> most recently used order: a hit moves the key to the end,
+# and once there are more than `maxsize` entries the first one is evicted (LRU).
+# Every entry also has its own expiry time (TTL), checked when it is read.
+# Concurrent misses for the same key share one computation (single-flight):
+# the first caller computes, the others await the same future.
+class TTLCache:
+    def __init__(self, maxsize: int = 10_000, ttl: float = 60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._pending = {}  # key -> future of the running computation
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > self.clock()
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float | None = None):
+        self._entries[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    # Cached value of `key`, or the result of compute() (a function or coroutine function)
+    async def get_or_compute(self, key, compute, ttl: float | None = None):
+        value = self.get(key, MISSING)
+        if value is not MISSING:
+            self.hits += 1
+            return value
+        pending = self._pending.get(key)
+        if pending is not None:
+            # another request is computing this key right now (counted as a hit)
+            self.hits += 1
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = compute()
+            if inspect.isawaitable(value):
+                value = await value
+        except Exception as exc:
+            # waiting requests get the same error, nothing is cached
+            future.set_exception(exc)
+            # mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            del self._pending[key]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,69 @@
+import numpy as np
+
+PRODUCTS = [
+    {"id": 1, "name": "Iphone 15", "price": 799.0, "category": "electronics"},
+    {"id": 2, "name": "Samsung S24", "price": 580.0, "category": "electronics"},
+    {"id": 3, "name": "Wireless Mouse", "price": 25.5, "category": "electronics"},
+    {"id": 4, "name": "Noise Cancelling Headphones", "price": 199.99, "category": "electronics"},
+    {"id": 5, "name": "Cotton Jacket", "price": 55.99, "category": "clothing"},
+    {"id": 6, "name": "Slim Fit T-Shirt", "price": 22.3, "category": "clothing"},
+    {"id": 7, "name": "Running Shoes", "price": 89.0, "category": "clothing"},
+    {"id": 8, "name": "Clean Code", "price": 37.5, "category": "books"},
+    {"id": 9, "name": "Fluent Python", "price": 49.99, "category": "books"},
+    {"id": 10, "name": "The Pragmatic Programmer", "price": 42.0, "category": "books"},
+]
+
+
+# Column store: one NumPy array per field instead of one dict per product.
+# `order` holds the row numbers sorted by price, so a price range is two
+# binary searches (np.searchsorted) and a slice, never a Python loop.
+class ProductColumns:
+    def __init__(self, products):
+        self.ids = np.array([p["id"] for p in products], dtype=np.int64)
+        self.names = np.array([p["name"] for p in products], dtype=object)
+        self.prices = np.array([p["price"] for p in products], dtype=np.float64)
+        # categories are stored as small integer codes
+        self.category_names = sorted({p["category"] for p in products})
+        self.category_codes = {name: code for code, name in enumerate(self.category_names)}
+        self.categories = np.array(
+            [self.category_codes[p["category"]] for p in products], dtype=np.int16
+        )
+        self.order = np.argsort(self.prices, kind="stable")
+        self.sorted_prices = self.prices[self.order]
+        # categories in price order, so the category mask is a contiguous slice too
+        self.sorted_categories = self.categories[self.order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Positions in `order` with min_price <= price <= max_price
+    def price_range(self, min_price: float = 0, max_price: float | None = None):
+        start = np.searchsorted(self.sorted_prices, min_price, side="left")
+        end = len(self.sorted_prices) if max_price is None else \
+            np.searchsorted(self.sorted_prices, max_price, side="right")
+        return start, end
+
+    def filter(self, min_price=0, max_price=None, category=None, limit=10, offset=0):
+        start, end = self.price_range(min_price, max_price)
+        if category is None:
+            total = max(end - start, 0)
+            page = self.order[start + offset:min(start + offset + limit, end)]
+            return int(total), self.to_dicts(page)
+        code = self.category_codes.get(category.lower())
+        if code is None:
+            return 0, []
+        mask = self.sorted_categories[start:end] == code
+        matches = np.flatnonzero(mask)
+        page = self.order[start + matches[offset:offset + limit]]
+        return len(matches), self.to_dicts(page)
+
+    def to_dicts(self, rows):
+        return [
+            {"id": int(i), "name": name, "price": float(price), "category": self.category_names[c]}
+            for i, name, price, c in zip(
+                self.ids[rows], self.names[rows], self.prices[rows], self.categories[rows]
+            )
+        ]
+
+
+CATALOG = ProductColumns(PRODUCTS)
@@ -0,0 +1,75 @@
+# Load test: POST /products/recommendations with many clients sharing few sessions
+# CLIENTS concurrent clients send REQUESTS requests each through the ASGI app (no network),
+# every request picks one of SESSIONS sessions and one of a few price ranges.
+# The same run is done with the cache disabled (maxsize=0) and enabled.
+# Run from the ch20 folder: python app/load_test.py
+import asyncio
+import random
+import time
+
+import httpx
+
+import main
+from cache import TTLCache
+from catalog import ProductColumns
+from recommender import CoOccurrenceRecommender
+
+SIZE = 1_000_000
+CLIENTS = 100
+REQUESTS = 50
+SESSIONS = 10
+CATEGORIES = ["books", "clothing", "electronics"]
+PRICE_RANGES = [(0, 50), (50, 200), (200, 1000), (1000, None)]
+
+random.seed(42)
+main.CATALOG = ProductColumns([
+    {"id": i, "name": f"Product {i}", "price": round(random.uniform(1, 2000), 2), "category": random.choice(CATEGORIES)}
+    for i in range(1, SIZE + 1)
+])
+main.RECOMMENDER = CoOccurrenceRecommender(main.CATALOG)
+
+
+async def client_loop(client, latencies):
+    for _ in range(REQUESTS):
+        session = random.randrange(SESSIONS)
+        min_price, max_price = random.choice(PRICE_RANGES)
+        # some sessions have no preferred_category (the default request)
+        category = (CATEGORIES + [None])[session % (len(CATEGORIES) + 1)]
+        cookies = f"session_id=s{session}" + (f"; preferred_category={category}" if category else "")
+        start = time.perf_counter()
+        response = await client.post(
+            "/products/recommendations",
+            headers={"Cookie": cookies},
+            json={"price_filter": {"min_price": min_price, "max_price": max_price}},
+        )
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+
+async def run(label, cache):
+    main.RECOMMENDATIONS_CACHE = cache
+    latencies = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, latencies) for _ in range(CLIENTS)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    stats = cache.stats()
+    print(
+        f"{label}: {len(latencies) / elapsed:7.0f} req/s | "
+        f"p50 {latencies[len(latencies) // 2] * 1000:6.2f} ms | "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.2f} ms | "
+        f"hits {stats['hits']} misses {stats['misses']} evictions {stats['evictions']}"
+    )
+
+
+async def run_all():
+    print(f"{CLIENTS} clients x {REQUESTS} requests, {SESSIONS} sessions, {SIZE:,} products")
+    await run("no cache", TTLCache(maxsize=0))
+    await run("cache   ", TTLCache(maxsize=10_000, ttl=60))
+    await run("cache 16", TTLCache(maxsize=16, ttl=60))
+
+
+if __name__ == "__main__":
+    asyncio.run(run_all())
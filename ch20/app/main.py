@@ -1,6 +1,9 @@
-from fastapi import FastAPI,Cookie, Body
-from typing import Annotated
+from fastapi import FastAPI,Cookie, Body, Query
+from typing import Annotated, Literal
 from pydantic import BaseModel, Field
+from cache import TTLCache
+from catalog import CATALOG
+from recommender import CoOccurrenceRecommender
 app = FastAPI()
 
 # #Cookies with a Pydantic Model
@@ -53,11 +56,27 @@ class PriceFilter(BaseModel):
     min_price: float = Field(ge=0, title="Minimum Price", description="Minimum price for recommendations")
     max_price: float | None = Field(default=None, title="Maximum Price", description="Maximum price for recommendations")
 
-@app.post("/products/recommendations")
-async def get_recommendations(
-   cookies: Annotated[ProductCookies, Cookie()],
-   price_filter: Annotated[PriceFilter, Body(embed=True)]
+class ProductEvent(BaseModel):
+    product_id: int = Field(title="Product ID", description="Viewed or purchased product")
+    event: Literal["view", "purchase"] = Field(default="view", title="Event", description="Kind of interaction")
+
+# Item-to-item recommendations learned from the events (see app/recommender.py)
+RECOMMENDER = CoOccurrenceRecommender(CATALOG)
+
+@app.post("/products/events")
+async def record_events(
+   session_id: Annotated[str, Cookie(title="Session ID", description="User session identifier")],
+   events: list[ProductEvent]
    ):
+  unknown = [e.product_id for e in events if not RECOMMENDER.record(session_id, e.product_id, e.event)]
+  return {"session_id": session_id, "recorded": len(events) - len(unknown), "unknown_products": unknown}
+
+# Recommendations are cached per (session, category, price range, page) for RECOMMENDATIONS_TTL seconds;
+# the session's event count is part of the key, so a new event is reflected right away
+RECOMMENDATIONS_TTL = 60
+RECOMMENDATIONS_CACHE = TTLCache(maxsize=10_000, ttl=RECOMMENDATIONS_TTL)
+
+def build_recommendations(cookies: ProductCookies, price_filter: PriceFilter, limit: int, offset: int):
   response = {"session_id": cookies.session_id}
   if cookies.preferred_category:
     response["category"] = cookies.preferred_category
@@ -66,6 +85,38 @@ async def get_recommendations(
         "max_price": price_filter.max_price
     }
   response["message"] = f"Recommendations for session {cookies.session_id} with price range {price_filter.min_price} to {price_filter.max_price or 'unlimited'}"
+  total, recommended, products = RECOMMENDER.page(
+      cookies.session_id,
+      min_price=price_filter.min_price,
+      max_price=price_filter.max_price,
+      category=cookies.preferred_category,
+      limit=limit,
+      offset=offset,
+  )
+  response["total"] = total
+  response["recommended"] = recommended
+  response["limit"] = limit
+  response["offset"] = offset
+  response["products"] = products
   return response
 
+@app.post("/products/recommendations")
+async def get_recommendations(
+   cookies: Annotated[ProductCookies, Cookie()],
+   price_filter: Annotated[PriceFilter, Body(embed=True)],
+   limit: Annotated[int, Query(ge=1, le=100)] = 10,
+   offset: Annotated[int, Query(ge=0)] = 0
+   ):
+  key = (
+      cookies.session_id, RECOMMENDER.session_version(cookies.session_id),
+      cookies.preferred_category, price_filter.min_price, price_filter.max_price, limit, offset,
+  )
+  return await RECOMMENDATIONS_CACHE.get_or_compute(
+      key, lambda: build_recommendations(cookies, price_filter, limit, offset)
+  )
+
+@app.get("/products/recommendations/cache")
+async def recommendations_cache_stats():
+  return RECOMMENDATIONS_CACHE.stats()
+
 # curl -X POST -H "Cookie: session_id=abc123; preferred_category=Electronics" -H "Content-Type: application/json" -d "{\"price_filter\":{\"min_price\":50.0,\"max_price\":1000.0}}" http://127.0.0.1:8000/products/recommendations
\ No newline at end of file
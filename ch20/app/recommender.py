@@ -0,0 +1,211 @@
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+EVENT_WEIGHTS = {"view": 1.0, "purchase": 3.0}
+
+
+# Item-to-item recommendations from co-occurrence
+# Every event pairs the product with the session's recent products (both directions),
+# so items often viewed / bought in the same session end up with a high count.
+# Counts live in a sparse matrix in CSR form (row r = products seen together with r):
+#   indptr[r]:indptr[r + 1] is the slice of `indices` (columns) and `data` (counts) of row r.
+# New pairs are collected in a dict and merged into the matrix every `batch_size` pairs
+# (or `flush_interval` seconds); only the rows touched by a batch get their top-K
+# neighbor list recomputed.
+# A lookup merges the neighbor lists of the session's recent products, so it never
+# touches the matrix itself (a few hundred candidates, whatever the catalog size).
+class CoOccurrenceRecommender:
+    def __init__(self, catalog, top_k=50, window=20, batch_size=100_000, flush_interval=1.0, max_sessions=100_000):
+        self.catalog = catalog
+        self.top_k = top_k
+        self.window = window
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._flushed_at = time.monotonic()
+        self.max_sessions = max_sessions
+        size = len(catalog)
+        # product id -> row: binary search over the sorted ids (no dict of 1M entries)
+        self._id_order = np.argsort(catalog.ids, kind="stable")
+        self._sorted_ids = catalog.ids[self._id_order]
+        # row -> position in catalog.order (price order), to find a row in a filtered listing
+        self._price_rank = np.empty(size, dtype=np.int64)
+        self._price_rank[catalog.order] = np.arange(size)
+        # co-occurrence matrix (CSR) and the total event weight of every row
+        self.indptr = np.zeros(size + 1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.data = np.zeros(0, dtype=np.float32)
+        self.counts = np.zeros(size, dtype=np.float32)
+        # row -> (neighbor rows, scores), best first
+        self.neighbors = {}
+        self._pending = {}
+        self._pending_counts = {}
+        # session_id -> recent rows (oldest first); least recently active sessions are dropped
+        self._sessions = OrderedDict()
+        self._session_versions = {}
+
+    def row_of(self, product_id: int):
+        position = np.searchsorted(self._sorted_ids, product_id)
+        if position < len(self._sorted_ids) and self._sorted_ids[position] == product_id:
+            return int(self._id_order[position])
+        return None
+
+    # Add one view / purchase event, returns False for an unknown product
+    def record(self, session_id: str, product_id: int, event: str = "view"):
+        row = self.row_of(product_id)
+        if row is None:
+            return False
+        weight = EVENT_WEIGHTS[event]
+        history = self._sessions.get(session_id)
+        if history is None:
+            history = self._sessions[session_id] = deque(maxlen=self.window)
+            if len(self._sessions) > self.max_sessions:
+                dropped, _ = self._sessions.popitem(last=False)
+                self._session_versions.pop(dropped, None)
+        else:
+            self._sessions.move_to_end(session_id)
+        for other in set(history):
+            if other != row:
+                self._pending[row, other] = self._pending.get((row, other), 0.0) + weight
+                self._pending[other, row] = self._pending.get((other, row), 0.0) + weight
+        self._pending_counts[row] = self._pending_counts.get(row, 0.0) + weight
+        if row in history:
+            history.remove(row)
+        history.append(row)
+        self._session_versions[session_id] = self._session_versions.get(session_id, 0) + 1
+        if len(self._pending) >= self.batch_size or time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+        return True
+
+    def recent(self, session_id: str):
+        return list(self._sessions.get(session_id, ()))
+
+    # changes with every event of the session (part of the recommendation cache key)
+    def session_version(self, session_id: str):
+        return self._session_versions.get(session_id, 0)
+
+    # Merge the pending pairs into the CSR matrix and refresh the touched neighbor lists
+    def flush(self):
+        self._flushed_at = time.monotonic()
+        if not self._pending:
+            return
+        pairs = np.array(list(self._pending), dtype=np.int64)
+        weights = np.fromiter(self._pending.values(), dtype=np.float32, count=len(self._pending))
+        for row, weight in self._pending_counts.items():
+            self.counts[row] += weight
+        self._pending.clear()
+        self._pending_counts.clear()
+
+        size = len(self.counts)
+        # one int64 key per cell (row * size + column); CSR cells are already sorted by it
+        keys, inverse = np.unique(pairs[:, 0] * size + pairs[:, 1], return_inverse=True)
+        values = np.bincount(inverse, weights=weights).astype(np.float32)
+        old_keys = np.repeat(np.arange(size, dtype=np.int64), np.diff(self.indptr)) * size + self.indices
+        positions = np.searchsorted(old_keys, keys)
+        found = positions < len(old_keys)
+        found[found] = old_keys[positions[found]] == keys[found]
+        # existing cells are incremented in place, new cells are inserted at their sorted position
+        self.data[positions[found]] += values[found]
+        new = ~found
+        self.indices = np.insert(self.indices, positions[new], (keys[new] % size).astype(np.int32))
+        self.data = np.insert(self.data, positions[new], values[new])
+        self.indptr[1:] += np.cumsum(np.bincount(keys[new] // size, minlength=size))
+
+        self._update_neighbors(np.unique(keys // size))
+
+    # top-K of the given rows, score = co-occurrence / sqrt(count_a * count_b) (cosine-like,
+    # so best sellers that appear next to everything don't top every list).
+    # All rows are scored and sorted together, only the final split is per row.
+    def _update_neighbors(self, rows):
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        cells = np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)
+        groups = np.repeat(np.arange(len(rows)), lengths)
+        columns = self.indices[cells]
+        scores = self.data[cells] / np.sqrt(self.counts[rows][groups] * self.counts[columns])
+        # by row, then best score first
+        order = np.lexsort((-scores, groups))
+        keep = order[np.arange(len(order)) - np.repeat(offsets, lengths) < self.top_k]
+        columns, scores = columns[keep], scores[keep]
+        split = np.cumsum(np.minimum(lengths, self.top_k))[:-1]
+        self.neighbors.update(zip(
+            rows.tolist(), zip(np.split(columns, split), np.split(scores.astype(np.float32), split))
+        ))
+
+    # Rows recommended for the session, best first, within the price range / category
+    def recommend(self, session_id: str, min_price=0, max_price=None, category=None, limit=10):
+        recent = self.recent(session_id)
+        lists = [self.neighbors[row] for row in recent if row in self.neighbors]
+        if not lists:
+            return []
+        code = None
+        if category is not None:
+            code = self.catalog.category_codes.get(category.lower())
+            if code is None:
+                return []
+        rows, inverse = np.unique(np.concatenate([columns for columns, _ in lists]), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate([scores for _, scores in lists]))
+        prices = self.catalog.prices[rows]
+        mask = ~np.isin(rows, recent) & (prices >= min_price)
+        if max_price is not None:
+            mask &= prices <= max_price
+        if code is not None:
+            mask &= self.catalog.categories[rows] == code
+        rows, scores = rows[mask], scores[mask]
+        order = np.lexsort((rows, -scores))[:limit]
+        return rows[order]
+
+    # One page of recommendations out of one sequence: all co-occurrence results first, then
+    # the other catalog products matching the same filter (so new sessions still get products),
+    # without the recommended products and the ones the session has just seen.
+    # The catalog part is never materialized: the few excluded products are located in the
+    # filtered listing, and the page is read from the listing around them.
+    # Returns (length of the whole sequence, number of co-occurrence results, products)
+    def page(self, session_id: str, min_price=0, max_price=None, category=None, limit=10, offset=0):
+        ranked = self.recommend(session_id, min_price, max_price, category, limit=None)
+        products = self.catalog.to_dicts(ranked[offset:offset + limit])
+        # positions in catalog.order of the products left out of the catalog part
+        excluded = self._price_rank[np.union1d(ranked, self.recent(session_id)).astype(np.int64)]
+        start, end, matches = self._listing(min_price, max_price, category)
+        if matches is None:
+            size = int(max(end - start, 0))
+            skipped = np.sort(excluded[(excluded >= start) & (excluded < end)] - start)
+        else:
+            size = len(matches)
+            # matches is sorted: a binary search per excluded product
+            skipped = np.searchsorted(matches, excluded)
+            found = skipped < size
+            found[found] = matches[skipped[found]] == excluded[found]
+            skipped = np.sort(skipped[found])
+        total = len(ranked) + size - len(skipped)
+        missing = limit - len(products)
+        if missing > 0:
+            # listing position of the first catalog product of this page: every skipped
+            # position up to it moves it one further
+            position = max(0, offset - len(ranked))
+            for skip in skipped.tolist():
+                if skip > position:
+                    break
+                position += 1
+            count = missing + int(np.count_nonzero(skipped > position))
+            if matches is None:
+                window = np.arange(start + position, min(start + position + count, end))
+            else:
+                window = matches[position:position + count]
+            window = window[~np.isin(window, excluded)][:missing]
+            products += self.catalog.to_dicts(self.catalog.order[window])
+        return total, len(ranked), products
+
+    # The listing catalog.filter() pages through: positions start:end of catalog.order
+    # (price range), and of those the ones in the category (None without a category)
+    def _listing(self, min_price=0, max_price=None, category=None):
+        catalog = self.catalog
+        start, end = catalog.price_range(min_price, max_price)
+        if category is None:
+            return start, end, None
+        code = catalog.category_codes.get(category.lower())
+        if code is None:
+            return start, end, np.zeros(0, dtype=np.int64)
+        return start, end, start + np.flatnonzero(catalog.sorted_categories[start:end] == code)
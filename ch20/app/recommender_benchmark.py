@@ -0,0 +1,61 @@
+# Benchmark: co-occurrence recommendations over 1M products
+# Simulated event log: every session browses around one "interest" (products close by id,
+# e.g. the same shelf) with a few random clicks. Reports the ingestion rate (batched
+# CSR updates included) and the latency of recommendation lookups (target: p99 < 5 ms).
+# Run from the ch20 folder: python app/recommender_benchmark.py
+import random
+import time
+
+import numpy as np
+
+from catalog import ProductColumns
+from recommender import CoOccurrenceRecommender
+
+SIZE = 1_000_000
+SESSIONS = 200_000
+EVENTS_PER_SESSION = 10
+LOOKUPS = 10_000
+CATEGORIES = ["books", "clothing", "electronics"]
+
+random.seed(42)
+catalog = ProductColumns([
+    {"id": i, "name": f"Product {i}", "price": round(random.uniform(1, 2000), 2), "category": random.choice(CATEGORIES)}
+    for i in range(1, SIZE + 1)
+])
+recommender = CoOccurrenceRecommender(catalog, flush_interval=float("inf"))
+
+start = time.perf_counter()
+flush_time = 0.0
+events = 0
+for session in range(SESSIONS):
+    interest = random.randint(1, SIZE)
+    for _ in range(EVENTS_PER_SESSION):
+        if random.random() < 0.8:
+            product_id = min(SIZE, max(1, interest + random.randint(-50, 50)))
+        else:
+            product_id = random.randint(1, SIZE)
+        pending = len(recommender._pending)
+        flush_start = time.perf_counter()
+        recommender.record(f"s{session}", product_id, "purchase" if random.random() < 0.1 else "view")
+        if len(recommender._pending) < pending:
+            flush_time += time.perf_counter() - flush_start
+        events += 1
+recommender.flush()
+elapsed = time.perf_counter() - start
+print(f"ingest {events:,} events: {elapsed:.1f} s ({events / elapsed:,.0f} events/s, {flush_time:.1f} s in CSR batch updates)")
+print(f"matrix: {len(recommender.data):,} non-zero cells, {len(recommender.neighbors):,} neighbor lists")
+
+# lookups for sessions that are still in the session table
+sessions = [f"s{s}" for s in range(SESSIONS - 50_000, SESSIONS)]
+latencies = []
+for _ in range(LOOKUPS):
+    low = random.uniform(0, 1500)
+    category = random.choice(CATEGORIES + [None])
+    start = time.perf_counter()
+    recommender.page(random.choice(sessions), min_price=low, max_price=low + 500, category=category, limit=10)
+    latencies.append(time.perf_counter() - start)
+latencies = np.array(latencies) * 1000
+print(
+    f"lookup ({LOOKUPS:,}): p50 {np.percentile(latencies, 50):.3f} ms | "
+    f"p99 {np.percentile(latencies, 99):.3f} ms | max {latencies.max():.3f} ms"
+)
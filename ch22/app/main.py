@@ -1,6 +1,9 @@
-from typing import Annotated
-from fastapi import FastAPI, Header, Body, Cookie
+from typing import Annotated, Literal
+from fastapi import FastAPI, Header, Body, Cookie, Query
 from pydantic import BaseModel, Field
+from cache import TTLCache
+from catalog import CATALOG
+from recommender import CoOccurrenceRecommender
 app = FastAPI()
 
 # ## Headers with a Pydantic Model
@@ -50,12 +53,27 @@ class ProductHeaders(BaseModel):
   accept_language: str | None = None
   x_tracking_id: list[str] = []
   
-@app.post("/products/recomendations")
-async def get_recomendations(
-    cookies: Annotated[ProductCookies, Cookie()],
-    headers: Annotated[ProductHeaders, Header()],
-    price_filter: Annotated[PriceFilter, Body(embed=True)]
+class ProductEvent(BaseModel):
+    product_id: int = Field(title="Product ID", description="Viewed or purchased product")
+    event: Literal["view", "purchase"] = Field(default="view", title="Event", description="Kind of interaction")
+
+# Item-to-item recommendations learned from the events (see app/recommender.py)
+RECOMMENDER = CoOccurrenceRecommender(CATALOG)
+
+@app.post("/products/events")
+async def record_events(
+    session_id: Annotated[str, Cookie(title="Session ID", description="User session identifier")],
+    events: list[ProductEvent]
     ):
+    unknown = [e.product_id for e in events if not RECOMMENDER.record(session_id, e.product_id, e.event)]
+    return {"session_id": session_id, "recorded": len(events) - len(unknown), "unknown_products": unknown}
+
+# Recommendations are cached per (session, category, price range, page, authorization) for RECOMMENDATIONS_TTL seconds;
+# the session's event count is part of the key, so a new event is reflected right away
+RECOMMENDATIONS_TTL = 60
+RECOMMENDATIONS_CACHE = TTLCache(maxsize=10_000, ttl=RECOMMENDATIONS_TTL)
+
+def build_recommendations(cookies: ProductCookies, headers: ProductHeaders, price_filter: PriceFilter, limit: int, offset: int):
     response = {"session_id": cookies.session_id}
     if cookies.preferred_category:
         response["category"] = cookies.preferred_category
@@ -66,7 +84,43 @@ async def get_recomendations(
         "max_price": price_filter.max_price
     }
     response["message"] = f"Recommendations for session {cookies.session_id} with price range {price_filter.min_price} to {price_filter.max_price or 'unlimited'} with {headers.authorization}"
+    total, recommended, products = RECOMMENDER.page(
+        cookies.session_id,
+        min_price=price_filter.min_price,
+        max_price=price_filter.max_price,
+        category=cookies.preferred_category,
+        limit=limit,
+        offset=offset,
+    )
+    response["total"] = total
+    response["recommended"] = recommended
+    response["limit"] = limit
+    response["offset"] = offset
+    response["products"] = products
     return response
+
+@app.post("/products/recomendations")
+async def get_recomendations(
+    cookies: Annotated[ProductCookies, Cookie()],
+    headers: Annotated[ProductHeaders, Header()],
+    price_filter: Annotated[PriceFilter, Body(embed=True)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    offset: Annotated[int, Query(ge=0)] = 0
+    ):
+    # the authorization header is echoed in the response, so it is part of the key
+    key = (
+        cookies.session_id, RECOMMENDER.session_version(cookies.session_id),
+        cookies.preferred_category, price_filter.min_price, price_filter.max_price,
+        limit, offset, headers.authorization,
+    )
+    return await RECOMMENDATIONS_CACHE.get_or_compute(
+        key, lambda: build_recommendations(cookies, headers, price_filter, limit, offset)
+    )
+
+@app.get("/products/recomendations/cache")
+async def recommendations_cache_stats():
+    return RECOMMENDATIONS_CACHE.stats()
+
 # curl -X POST "http://127.0.0.1:8000/products/recomendations" -H "Content-Type: application/json" -H "Authorization: Bearer mysecrettoken" -H "Accept-Language: en-US" -H "X-Tracking-Id: track123" -H "X-Tracking-Id: track456" -b "session_id=abc123; preferred_category=electronics" -d "{\"price_filter\": {\"min_price\": 100, \"max_price\": 500}}"
 
 
@@ -0,0 +1,73 @@
+# Benchmark: response_model path vs fast_response() (see main.py)
+# Three routes return the same N products through the ASGI app (no network):
+#   response_model   raw dicts, validated + serialized by FastAPI (the old get_products)
+#   fast (dicts)     raw dicts, validated once by the TypeAdapter and dumped to JSON bytes
+#   fast (models)    products validated ahead of time, only dumped to JSON bytes
+# Run from the ch24 folder: python app/benchmark.py
+import asyncio
+import time
+from typing import List
+
+import httpx
+from fastapi import FastAPI
+
+from main import PRODUCT_LIST_ADAPTER, Products, fast_response
+
+SIZES = [1, 100, 1_000, 10_000]
+
+
+def build_app(rows):
+    models = PRODUCT_LIST_ADAPTER.validate_python(rows)
+    app = FastAPI()
+
+    @app.get("/response-model", response_model=List[Products])
+    async def response_model_route():
+        return rows
+
+    @app.get("/fast-dicts", response_model=List[Products])
+    async def fast_dicts_route():
+        return fast_response(rows, PRODUCT_LIST_ADAPTER)
+
+    @app.get("/fast-models", response_model=List[Products])
+    async def fast_models_route():
+        return fast_response(models, PRODUCT_LIST_ADAPTER)
+
+    return app
+
+
+async def time_route(client, url, requests):
+    first = await client.get(url)
+    first.raise_for_status()
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get(url)
+        best = min(best, (time.perf_counter() - start) / requests)
+    return best, first.content
+
+
+async def main():
+    print(f"{'items':>7} | {'response_model':>18} | {'fast (dicts)':>18} | {'fast (models)':>18} | speedup")
+    for size in SIZES:
+        rows = [
+            {"id": i, "name": f"product {i}", "price": 10.0 + i, "stock": i % 50, "desc": "hello"}
+            for i in range(size)
+        ]
+        requests = max(5, 2_000 // size)
+        transport = httpx.ASGITransport(app=build_app(rows))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            slow, slow_body = await time_route(client, "/response-model", requests)
+            dicts, dicts_body = await time_route(client, "/fast-dicts", requests)
+            models, models_body = await time_route(client, "/fast-models", requests)
+        # json.dumps adds spaces, compare the parsed bodies
+        assert httpx.Response(200, content=slow_body).json() == httpx.Response(200, content=models_body).json()
+        assert dicts_body == models_body
+        per_item = lambda seconds: f"{seconds / size * 1e6:10.2f} µs/item"
+        print(
+            f"{size:>7} | {per_item(slow)} | {per_item(dicts)} | {per_item(models)} | {slow / models:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
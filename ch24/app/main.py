@@ -1,5 +1,5 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi import FastAPI, Response
+from pydantic import BaseModel, TypeAdapter
 from typing import List,Any
 
 app = FastAPI()
@@ -29,13 +29,32 @@ class ProductsOut(BaseModel):
 #          {"id" : 1 ,"name" : "Pixel 9" , "price" : 80000, "stock" : 12}
 #     ]
 
+# Fast response path
+# With response_model FastAPI dumps a returned model to a dict, validates that dict again
+# against the response model, turns the result into Python objects and only then encodes JSON.
+# Here the adapters are built once, validated instances are passed through by pydantic-core
+# (revalidate_instances="never") and dump_json() writes the bytes directly.
+# response_model is kept so /docs still shows the schema; returning a Response skips FastAPI's own step.
+PRODUCT_ADAPTER = TypeAdapter(Products)
+PRODUCT_LIST_ADAPTER = TypeAdapter(List[Products])
+
+
+def fast_response(content, adapter: TypeAdapter, status_code: int = 200) -> Response:
+    # raw dicts are validated once (unknown fields stripped), model instances are used as they are
+    content = adapter.validate_python(content)
+    return Response(adapter.dump_json(content), status_code=status_code, media_type="application/json")
+
+
+# validated once at startup, "desc" is removed here instead of on every request
+PRODUCTS = PRODUCT_LIST_ADAPTER.validate_python([
+     {"id" : 1 ,"name" : "iphone 17" , "price" : 70000, "stock" : 5,"desc" : "hello 1"},
+     {"id" : 1 ,"name" : "samsung s24" , "price" : 58000, "stock" : 7,"desc" : "hello 5"},
+     {"id" : 1 ,"name" : "Pixel 9" , "price" : 80000, "stock" : 12,"desc" : "hello 9"}
+])
+
 @app.get("/products/",response_model=List[Products])
 async def get_products():
-    return [
-         {"id" : 1 ,"name" : "iphone 17" , "price" : 70000, "stock" : 5,"desc" : "hello 1"},
-         {"id" : 1 ,"name" : "samsung s24" , "price" : 58000, "stock" : 7,"desc" : "hello 5"},
-         {"id" : 1 ,"name" : "Pixel 9" , "price" : 80000, "stock" : 12,"desc" : "hello 9"}
-    ]
+    return fast_response(PRODUCTS, PRODUCT_LIST_ADAPTER)
  
 # @app.post("/products/",response_model=Products)
 # async def create_product(product : Products):
@@ -58,4 +77,5 @@ async def get_products():
 
 @app.post("/products/",response_model=Products)
 async def create_product(product : Products) -> Any:
-    return product
\ No newline at end of file
+    # already validated as the request body, only serialized here
+    return fast_response(product, PRODUCT_ADAPTER)
@@ -1,16 +1,35 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import List, Any, Optional
+from fastapi import FastAPI, Header, Response
+from pydantic import BaseModel, create_model
+from functools import lru_cache
+from itertools import count
+from typing import List, Any, Optional, Annotated
+from records import ProductRecord
 
 app = FastAPI()
 
 ## Excluding Unset Default Values
 
 products_db = {
-    "1": {"id": "1", "name": "Laptop", "price": 999.99, "stock": 10, "is_active": True},
-    "2": {"id": "2", "name": "Smartphone", "price": 499.99, "stock": 50, "is_active": False}
+    "1": ProductRecord({"id": "1", "name": "Laptop", "price": 999.99, "stock": 10, "is_active": True}),
+    "2": ProductRecord({"id": "2", "name": "Smartphone", "price": 499.99, "stock": 50, "is_active": False})
 }
 
+# Version of each product, changed by save_product(). Versions come from one
+# counter, so a deleted and re-added product never gets an old version back.
+version_counter = count(1)
+products_version = {product_id: next(version_counter) for product_id in products_db}
+
+def save_product(product_id: str, data: dict):
+    products_db[product_id] = ProductRecord(data)
+    products_version[product_id] = next(version_counter)
+
+# ETag / 304 Not Modified
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
 class Product(BaseModel):
     id: str
     name: str
@@ -18,15 +37,61 @@ class Product(BaseModel):
     description: Optional[str] = None
     tax: float = 15.0  # Default tax rate
 
+# Projection cache
+# response_model_include makes FastAPI validate the stored dict into a full Product
+# (building every field and default) and then drop the other fields on every request.
+# Instead, a model with only the included fields validates only those keys, and the
+# resulting JSON bytes are cached per (product_id, include) together with the version.
+@lru_cache
+def projection_model(include: frozenset[str]) -> type[BaseModel]:
+    fields = {name: (field.annotation, field) for name, field in Product.model_fields.items() if name in include}
+    return create_model(f"Product_{'_'.join(sorted(include))}", **fields)
+
+response_cache = {}
+
+def projected_body(product_id: str, include: frozenset[str]) -> bytes:
+    version = products_version[product_id]
+    cached = response_cache.get((product_id, include))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    product = products_db[product_id]
+    projected = {name: product[name] for name in include if name in product}
+    body = projection_model(include).model_validate(projected).model_dump_json().encode()
+    response_cache[(product_id, include)] = (version, body)
+    return body
+
 # @app.get("/products/{product_id}", response_model=Product, response_model_exclude_unset=True)
 # async def get_product(product_id: str):
 #     return products_db.get(product_id, {})
 
 # Including Specific Fields
-@app.get("/products/{product_id}", response_model=Product, response_model_include={"name", "price"})
-async def get_product(product_id: str):
+# An unchanged product is answered with an empty 304 before any validation / serialization,
+# otherwise with the cached projection (see projected_body)
+PRODUCT_INCLUDE = frozenset({"name", "price"})
+
+@app.get("/products/{product_id}", response_model=Product, response_model_include=PRODUCT_INCLUDE)
+async def get_product(product_id: str, if_none_match: Annotated[str | None, Header()] = None):
+    if product_id in products_version:
+        etag = f'"{product_id}-{products_version[product_id]}"'
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=projected_body(product_id, PRODUCT_INCLUDE), media_type="application/json", headers={"ETag": etag})
     return products_db.get(product_id, {})
 
+# PUT body: a full product (validated, so a stored product can always be read back),
+# the id comes from the path; other fields such as stock are kept as sent
+class ProductBody(BaseModel):
+    model_config = {"extra": "allow"}
+    name: str
+    price: float
+    description: Optional[str] = None
+    tax: float = 15.0
+
+@app.put("/products/{product_id}")
+async def update_product(product_id: str, product: ProductBody):
+    save_product(product_id, {**product.model_dump(exclude_unset=True), "id": product_id})
+    return {"status": "Updated", "product_id": product_id}
+
 # ## Excluding Specific Fields
 # @app.get("/products/{product_id}", response_model=Product, response_model_exclude={"tax", "description"})
 # async def get_product(product_id: str):
@@ -0,0 +1,70 @@
+import sys
+from collections.abc import MutableMapping
+
+
+# Compact record
+# A dict per product costs a hash table per product, and every product parsed from JSON
+# carries its own copy of repeated strings such as `description`.
+# A __slots__ class keeps the known fields in fixed attributes (no per-object dict),
+# and the `interned` fields are passed through sys.intern so equal strings are stored once.
+# It still behaves like a dict (product["id"], product.update(...), dict(product)),
+# so route handlers and FastAPI's JSON encoder don't need to change.
+class Record(MutableMapping):
+    __slots__ = ("_extra",)
+    fields = ()
+    interned = ()
+
+    def __init__(self, data=(), **fields):
+        # fields that are not declared in __slots__ end up here
+        self._extra = None
+        self.update(data, **fields)
+
+    def __getitem__(self, key):
+        if key in self.fields:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.fields:
+            if key in self.interned and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self.fields:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key in self.fields:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)})"
+
+
+class ProductRecord(Record):
+    __slots__ = ("id", "name", "price", "stock", "is_active", "description")
+    fields = __slots__
+    interned = ("description",)
@@ -0,0 +1,107 @@
+# Benchmark: event loop lag while uploads are written to disk
+# UPLOADS concurrent uploads of SIZE bytes go through the ASGI app while a ticker task
+# sleeps 1 ms in a loop and records how late it wakes up (= how long the loop was blocked).
+#   blocking      the old handler: open() + shutil.copyfileobj() on the event loop
+#   sink (...)    UploadSink, copy in a worker thread, with each fsync policy
+# Run from the ch28 folder: python app/benchmark.py
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Annotated
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+from uploads import FSYNC_CHUNK, FSYNC_CLOSE, FSYNC_NEVER, UploadSink
+
+UPLOADS = 8
+SIZE = 32 * 1024 * 1024
+CHUNK = 64 * 1024
+
+
+def blocking_app(directory):
+    app = FastAPI()
+
+    @app.post("/uploadfile/")
+    async def create_upload_file(file: Annotated[UploadFile, File()]):
+        with open(os.path.join(directory, file.filename), "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        return {"filename": file.filename}
+
+    return app
+
+
+def sink_app(directory, fsync):
+    app = FastAPI()
+    sink = UploadSink(directory, fsync=fsync)
+
+    @app.post("/uploadfile/")
+    async def create_upload_file(file: Annotated[UploadFile, File()]):
+        return await sink.save(file)
+
+    return app
+
+
+async def ticker(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+# the multipart body is encoded once up front and sent in socket-sized chunks,
+# so the client side doesn't block the loop it shares with the app
+async def chunks(body):
+    for start in range(0, len(body), CHUNK):
+        yield body[start:start + CHUNK]
+
+
+async def run(label, app, requests):
+    lags = []
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        tick = asyncio.create_task(ticker(lags, stop))
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post("/uploadfile/", headers=request.headers, content=chunks(request.read()))
+            for request in requests
+        ))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await tick
+    assert all(response.status_code == 200 for response in responses)
+    assert not any(response.json().get("duplicate") for response in responses)
+    lags.sort()
+    print(
+        f"{label:<14} | {elapsed:6.2f} s | lag p50 {statistics.median(lags) * 1000:6.2f} ms | "
+        f"p99 {lags[int(len(lags) * 0.99)] * 1000:7.2f} ms | max {lags[-1] * 1000:7.2f} ms"
+    )
+
+
+async def main():
+    # different content per file (its own first bytes), or the sink would only store the
+    # first one and link the others to it
+    payload = os.urandom(SIZE)
+    requests = []
+    for i in range(UPLOADS):
+        content = i.to_bytes(8, "big") + payload[8:]
+        request = httpx.Request("POST", "http://test/uploadfile/", files={"file": (f"file{i}.bin", content)})
+        request.headers.pop("content-length")
+        requests.append(request)
+    print(f"{UPLOADS} concurrent uploads x {SIZE // (1024 * 1024)} MB")
+    for label, build in [
+        ("blocking", lambda d: blocking_app(d)),
+        ("sink (never)", lambda d: sink_app(d, FSYNC_NEVER)),
+        ("sink (close)", lambda d: sink_app(d, FSYNC_CLOSE)),
+        ("sink (chunk)", lambda d: sink_app(d, FSYNC_CHUNK)),
+    ]:
+        with tempfile.TemporaryDirectory() as directory:
+            await run(label, build(directory), requests)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
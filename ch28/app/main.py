@@ -1,10 +1,57 @@
-from fastapi import FastAPI, File, UploadFile
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, Header, Query, Request, Response, UploadFile
 from fastapi.responses import HTMLResponse
+from pydantic import BaseModel, Field
 from typing import Annotated
-import os
-import shutil
 
-app = FastAPI()
+from resumable import ResumableUploads
+from upload_limits import UploadLimits, UploadSettings
+from uploads import FSYNC_NEVER, UploadSink
+
+# Objects no file name points at anymore are deleted in the background (see UploadSink.collect_garbage)
+GARBAGE_COLLECTION_INTERVAL = 3600.0
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # resumable sessions are kept on disk, only the stale ones (and leftover temp files) go
+    await RESUMABLE.expire()
+    collector = asyncio.create_task(UPLOADS.collect_garbage_every(GARBAGE_COLLECTION_INTERVAL))
+    yield
+    collector.cancel()
+
+app = FastAPI(lifespan=lifespan)
+
+# Upload limits of this app (each one can be overridden with UPLOAD_<NAME> environment variables)
+UPLOAD_SETTINGS = UploadSettings.from_env(
+    spool_size=1024 * 1024,                 # bytes of a file kept in RAM, the rest is spooled to disk
+    max_file_size=100 * 1024 * 1024,
+    max_files=1,                            # files per request
+    max_in_flight_bytes=64 * 1024 * 1024,   # RAM all uploads of this worker may hold at once
+    queue_timeout=10.0,                     # seconds an upload waits for the budget, then 503
+)
+
+# Uploads are written by a worker thread, the event loop keeps serving other requests
+UPLOADS = UploadSink(
+    "uploads",
+    chunk_size=1024 * 1024,   # bytes per read / write
+    fsync=FSYNC_NEVER,        # or FSYNC_CLOSE / FSYNC_CHUNK for durability
+    max_size=UPLOAD_SETTINGS.max_file_size,
+)
+
+# Multipart requests go through the limits: spools + the sink's buffers count against the budget
+UPLOAD_LIMITS = UploadLimits(UPLOAD_SETTINGS, handler_buffer=UPLOADS.buffer_size)
+app.router.route_class = UPLOAD_LIMITS.route_class
+
+# Large files: sent in chunks, resumed from the last offset after a disconnect
+RESUMABLE = ResumableUploads(UPLOADS, max_size=50 * 1024 * 1024 * 1024)
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str = Field(min_length=1, max_length=255)
+    size: int = Field(ge=0)
+    sha256: str | None = Field(default=None, pattern="^[0-9a-fA-F]{64}$")  # checked when completing
+    content_type: str | None = None
 
 
 # HTML form for testing
@@ -29,8 +76,41 @@ async def create_upload_file(file: Annotated[UploadFile | None, File()] = None):
     if not file:
         return {"message": "No upload file sent"}
     
-    save_path = f"uploads/{file.filename}"
-    os.makedirs("uploads", exist_ok=True)
-    with open(save_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    return {"filename": file.filename, "content_type": file.content_type}
\ No newline at end of file
+    return await UPLOADS.save(file)
+
+
+# Resumable upload:
+#   POST   /uploads/                        {"filename", "size"}  -> upload_id
+#   PATCH  /uploads/{upload_id}?offset=N    raw bytes of one chunk (optional X-Chunk-SHA256)
+#   GET    /uploads/{upload_id}             offset to resume from (also as Upload-Offset header)
+#   POST   /uploads/{upload_id}/complete    stores the file like /uploadfile/
+@app.post("/uploads/", status_code=201)
+async def create_upload_session(upload: UploadSessionCreate):
+    session = await RESUMABLE.create(upload.filename, upload.size, upload.sha256, upload.content_type)
+    return session.info()
+
+@app.patch("/uploads/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    offset: Annotated[int, Query(ge=0)],
+    x_chunk_sha256: Annotated[str | None, Header()] = None,
+):
+    session = await RESUMABLE.write_chunk(RESUMABLE.get(upload_id), offset, request.stream(), x_chunk_sha256)
+    response.headers["Upload-Offset"] = str(session.offset)
+    return session.info()
+
+@app.api_route("/uploads/{upload_id}", methods=["GET", "HEAD"])
+async def upload_status(upload_id: str, response: Response):
+    session = RESUMABLE.get(upload_id)
+    response.headers["Upload-Offset"] = str(session.offset)
+    return session.info()
+
+@app.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str):
+    return await RESUMABLE.complete(RESUMABLE.get(upload_id))
+
+@app.delete("/uploads/{upload_id}", status_code=204)
+async def abort_upload(upload_id: str):
+    await RESUMABLE.abort(RESUMABLE.get(upload_id))
@@ -0,0 +1,126 @@
+# Benchmark: worker memory with 500 concurrent uploads
+# CLIENTS uploads of SIZE bytes are sent at once through the ASGI app (bodies are generated
+# on the fly, so the client side holds almost nothing) and the peak RSS of the process is read
+# at the end. Every configuration runs in its own process, peak RSS can't be reset.
+#   starlette defaults   no limits: every upload keeps up to 1 MB (the default spool) in RAM,
+#                        plus what UploadSink buffers while it stores the file
+#   budget 64 MB         UploadLimits, at most 64 MB of spools + sink buffers in flight, the rest waits
+#   budget 16 MB         ... and with a smaller budget
+# Run from the ch28 folder: python app/memory_benchmark.py
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Annotated
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+from upload_limits import UploadLimits, UploadSettings
+from uploads import UploadSink
+
+CLIENTS = 500
+SIZE = 4 * 1024 * 1024
+CHUNK = 64 * 1024
+BOUNDARY = "benchmark-boundary"
+
+CONFIGURATIONS = {
+    "starlette defaults": None,
+    "budget 64 MB": UploadSettings(spool_size=1024 * 1024, max_in_flight_bytes=64 * 1024 * 1024, max_files=1, queue_timeout=600),
+    "budget 16 MB": UploadSettings(spool_size=1024 * 1024, max_in_flight_bytes=16 * 1024 * 1024, max_files=1, queue_timeout=600),
+}
+
+
+def make_app(directory, settings):
+    app = FastAPI()
+    sink = UploadSink(directory)
+    if settings is not None:
+        limits = app.state.limits = UploadLimits(settings, handler_buffer=sink.buffer_size)
+        app.router.route_class = limits.route_class
+
+    @app.post("/uploadfile/")
+    async def create_upload_file(file: Annotated[UploadFile, File()]):
+        return await sink.save(file)
+
+    return app
+
+
+def body_length():
+    return len(head(0)) + SIZE + len(tail())
+
+
+def head(index):
+    return (
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="f{index}.bin"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n{index:08d}"
+    ).encode()
+
+
+def tail():
+    return f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+# one shared chunk object, the body is never materialized
+async def body(index, filler=b"x" * CHUNK):
+    yield head(index)
+    remaining = SIZE - 8
+    while remaining:
+        part = filler[:min(CHUNK, remaining)]
+        remaining -= len(part)
+        yield part
+        await asyncio.sleep(0)
+    yield tail()
+
+
+async def run(label):
+    settings = CONFIGURATIONS[label]
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory, settings)
+        headers = {
+            "content-type": f"multipart/form-data; boundary={BOUNDARY}",
+            "content-length": str(body_length()),
+        }
+        limits = httpx.Limits(max_connections=None)
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=None, limits=limits
+        ) as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.post("/uploadfile/", headers=headers, content=body(index)) for index in range(CLIENTS)
+            ))
+            elapsed = time.perf_counter() - start
+    statuses = {}
+    for response in responses:
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return {
+        "elapsed": elapsed,
+        "baseline_rss": baseline,
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "statuses": statuses,
+        "budget_peak": app.state.limits.budget.peak if settings is not None else None,
+    }
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--run":
+        print(json.dumps(asyncio.run(run(sys.argv[2]))))
+        return
+    print(f"{CLIENTS} concurrent uploads of {SIZE // (1024 * 1024)} MB (RSS before the uploads: baseline)\n")
+    for label in CONFIGURATIONS:
+        output = subprocess.run(
+            [sys.executable, __file__, "--run", label], capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output)
+        budget_peak = "" if result["budget_peak"] is None else f" | budget peak {result['budget_peak'] / 1024 ** 2:5.1f} MB"
+        print(
+            f"{label:<18} | {result['elapsed']:6.2f} s | peak RSS {result['peak_rss'] / 1024 ** 2:7.1f} MB"
+            f" (baseline {result['baseline_rss'] / 1024 ** 2:5.1f} MB) | {result['statuses']}{budget_peak}"
+        )
+
+
+if __name__ == "__main__":
+    main()
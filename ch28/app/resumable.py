@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from bisect import insort
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import anyio
+from fastapi import HTTPException
+from starlette.requests import ClientDisconnect
+
+from uploads import ChecksumMismatch, UploadSink
+
+UPLOAD_ID = re.compile("[0-9a-f]{32}")
+
+
+# One file being uploaded in chunks
+# `received` is the sorted list of [start, end) byte ranges already on disk (merged),
+# `offset` is where the contiguous part from byte 0 ends, i.e. where a client resumes.
+class UploadSession:
+    def __init__(
+        self, upload_id: str, filename: str, size: int, temp_path: str, sha256=None, content_type=None, received=(),
+    ):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.size = size
+        self.temp_path = temp_path
+        self.sha256 = sha256
+        self.content_type = content_type
+        self.received = []
+        for start, end in received:
+            self.add_range(start, end)
+        self.completing = False
+
+    def add_range(self, start: int, end: int):
+        if start == end:
+            return
+        insort(self.received, [start, end])
+        merged = [self.received[0]]
+        for start, end in self.received[1:]:
+            if start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.received = merged
+
+    # the parts of [start, end) that are not received yet
+    def missing(self, start: int, end: int) -> list:
+        gaps = []
+        for received_start, received_end in self.received:
+            if received_end <= start:
+                continue
+            if received_start >= end:
+                break
+            if received_start > start:
+                gaps.append((start, received_start))
+            start = max(start, received_end)
+        if start < end:
+            gaps.append((start, end))
+        return gaps
+
+    @property
+    def offset(self) -> int:
+        if self.received and self.received[0][0] == 0:
+            return self.received[0][1]
+        return 0
+
+    @property
+    def complete(self) -> bool:
+        return self.offset == self.size
+
+    def info(self) -> dict:
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "size": self.size,
+            "offset": self.offset,
+            "received": self.received,
+            "complete": self.complete,
+        }
+
+    # what is saved next to the temp file (see ResumableUploads)
+    def metadata(self) -> dict:
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "size": self.size,
+            "sha256": self.sha256,
+            "content_type": self.content_type,
+            "received": [list(part) for part in self.received],
+        }
+
+
+# Resumable uploads
+# A multi-GB file sent as one multipart request starts over from byte 0 on any disconnect.
+# Here a client creates a session (the size is known up front), sends the file as chunks
+# at byte offsets (any order, several at a time) and asks for the offset to resume from.
+# Chunks are written with pwrite() into a sparse temp file of the final size, so nothing
+# is buffered or reassembled; finishing the session stores the file through the UploadSink.
+# A session lives on disk, in the sink's temp directory: `<upload_id>.upload` (the data) and
+# `<upload_id>.json` (file name, size, received ranges), so it survives a restart and every
+# worker can serve it; `sessions` only caches them.
+class ResumableUploads:
+    def __init__(self, sink: UploadSink, max_size=None, write_size=1024 * 1024, session_ttl=24 * 3600):
+        self.sink = sink
+        self.max_size = max_size
+        # bytes collected from the request body before one pwrite()
+        self.write_size = write_size
+        # sessions without any chunk for that long are dropped (with their temp file),
+        # as are other temp files that old (left behind by a crash)
+        self.session_ttl = session_ttl
+        self.sessions = {}
+
+    def _metadata_path(self, upload_id: str) -> str:
+        return os.path.join(self.sink.temp_directory, f"{upload_id}.json")
+
+    def _read_metadata(self, upload_id: str):
+        try:
+            with open(self._metadata_path(upload_id), "rb") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    # Runs in a worker thread: write the metadata next to the temp file (atomically, under a
+    # lock on the temp file); ranges another worker recorded meanwhile are merged in.
+    # Gets a copy of the session's metadata and returns the merged ranges, the session
+    # itself is only changed on the event loop (see _save()).
+    def _save_metadata(self, temp_path: str, metadata: dict) -> list:
+        try:
+            lock = open(temp_path, "rb")
+        except FileNotFoundError:
+            return []  # completed or aborted meanwhile
+        with lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+            merged = UploadSession(temp_path=temp_path, **metadata)
+            stored = self._read_metadata(merged.upload_id)
+            for start, end in stored["received"] if stored else ():
+                merged.add_range(start, end)
+            path = self._metadata_path(merged.upload_id)
+            temp_metadata_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(temp_metadata_path, "w") as file:
+                json.dump(merged.metadata(), file)
+            os.replace(temp_metadata_path, path)
+        return merged.received
+
+    async def _save(self, session: UploadSession):
+        received = await anyio.to_thread.run_sync(self._save_metadata, session.temp_path, session.metadata())
+        for start, end in received:
+            session.add_range(start, end)
+
+    # The session from disk (the cached one, updated with what other workers received)
+    def get(self, upload_id: str) -> UploadSession:
+        metadata = self._read_metadata(upload_id) if UPLOAD_ID.fullmatch(upload_id) else None
+        if metadata is None:
+            self.sessions.pop(upload_id, None)
+            raise HTTPException(status_code=404, detail="Unknown upload")
+        session = self.sessions.get(upload_id)
+        if session is None:
+            temp_path = os.path.join(self.sink.temp_directory, f"{upload_id}.upload")
+            session = self.sessions[upload_id] = UploadSession(temp_path=temp_path, **metadata)
+        else:
+            for start, end in metadata["received"]:
+                session.add_range(start, end)
+        return session
+
+    def _create_file(self, temp_path: str, size: int):
+        os.makedirs(self.sink.temp_directory, exist_ok=True)
+        with open(temp_path, "wb") as file:
+            file.truncate(size)  # sparse: no block is allocated until a chunk is written there
+
+    async def create(self, filename: str, size: int, sha256=None, content_type=None) -> UploadSession:
+        if self.max_size is not None and size > self.max_size:
+            raise HTTPException(status_code=413, detail=f"{filename} is larger than {self.max_size} bytes")
+        await self.expire()
+        upload_id = uuid.uuid4().hex
+        temp_path = os.path.join(self.sink.temp_directory, f"{upload_id}.upload")
+        await anyio.to_thread.run_sync(self._create_file, temp_path, size)
+        session = self.sessions[upload_id] = UploadSession(upload_id, filename, size, temp_path, sha256, content_type)
+        await self._save(session)
+        return session
+
+    # Write the (start, end) parts of data (which starts at byte `offset` of the file)
+    @staticmethod
+    def _pwrite(fd: int, data: bytes, offset: int, parts):
+        for start, end in parts:
+            view = memoryview(data)[start - offset:end - offset]
+            while view:
+                written = os.pwrite(fd, view, start)
+                view = view[written:]
+                start += written
+
+    # Write the request body at `offset`. The range only counts as received once it is
+    # completely written (and matches `checksum`, the chunk's sha256, when one is given).
+    # Without a checksum, the part written before a disconnect is kept.
+    # Bytes already received are final: only the parts of the chunk that are still missing
+    # are written, so a chunk that turns out bad (checksum, 416) never overwrites good data.
+    async def write_chunk(self, session: UploadSession, offset: int, stream, checksum=None) -> UploadSession:
+        if session.completing:
+            raise HTTPException(status_code=409, detail="Upload is being completed")
+        if offset > session.size:
+            raise HTTPException(status_code=416, detail=f"Offset {offset} is past the end ({session.size} bytes)")
+        digest = hashlib.sha256() if checksum else None
+        position = offset
+        buffer = bytearray()
+        fd = os.open(session.temp_path, os.O_WRONLY)
+        try:
+            async for data in stream:
+                if position + len(buffer) + len(data) > session.size:
+                    raise HTTPException(status_code=416, detail=f"Chunk goes past the end ({session.size} bytes)")
+                if digest is not None:
+                    digest.update(data)
+                buffer += data
+                if len(buffer) >= self.write_size:
+                    parts = session.missing(position, position + len(buffer))
+                    await anyio.to_thread.run_sync(self._pwrite, fd, bytes(buffer), position, parts)
+                    position += len(buffer)
+                    buffer.clear()
+            if buffer:
+                parts = session.missing(position, position + len(buffer))
+                await anyio.to_thread.run_sync(self._pwrite, fd, bytes(buffer), position, parts)
+                position += len(buffer)
+        except ClientDisconnect:
+            if digest is None:
+                session.add_range(offset, position)
+                await self._save(session)
+            raise
+        finally:
+            os.close(fd)
+        if digest is not None and digest.hexdigest() != checksum.lower():
+            raise HTTPException(status_code=400, detail="Chunk checksum mismatch, send it again")
+        session.add_range(offset, position)
+        await self._save(session)
+        return session
+
+    # Store the assembled file once every byte has been received
+    async def complete(self, session: UploadSession) -> dict:
+        if not session.complete:
+            raise HTTPException(status_code=409, detail={"message": "Upload is incomplete", **session.info()})
+        if session.completing:
+            raise HTTPException(status_code=409, detail="Upload is being completed")
+        session.completing = True
+        try:
+            saved = await self.sink.store_file(session.temp_path, session.filename, session.content_type, session.sha256)
+        except ChecksumMismatch as exc:
+            await self.abort(session)
+            raise HTTPException(status_code=400, detail=str(exc)) from None
+        except BaseException:
+            session.completing = False
+            raise
+        await self.abort(session)
+        return saved
+
+    async def abort(self, session: UploadSession):
+        self.sessions.pop(session.upload_id, None)
+        for path in (session.temp_path, self._metadata_path(session.upload_id)):
+            try:
+                await anyio.to_thread.run_sync(os.remove, path)
+            except FileNotFoundError:
+                pass
+
+    # Runs in a worker thread: delete the sessions without activity for `session_ttl`
+    # (the newest change of their data or metadata file) and every other temp file that old
+    def _sweep(self):
+        try:
+            entries = list(os.scandir(self.sink.temp_directory))
+        except FileNotFoundError:
+            return
+        groups = {}  # session id (or file name) -> [paths, last change]
+        for entry in entries:
+            name, extension = os.path.splitext(entry.name)
+            key = name if extension in (".upload", ".json") and UPLOAD_ID.fullmatch(name) else entry.name
+            try:
+                changed = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            group = groups.setdefault(key, [[], 0.0])
+            group[0].append(entry.path)
+            group[1] = max(group[1], changed)
+        now = time.time()
+        for key, (paths, changed) in groups.items():
+            session = self.sessions.get(key)
+            if now - changed <= self.session_ttl or (session is not None and session.completing):
+                continue
+            self.sessions.pop(key, None)
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    # called at startup and with every new session
+    async def expire(self):
+        await anyio.to_thread.run_sync(self._sweep)
@@ -0,0 +1,74 @@
+# Resumable upload client: sends a file in chunks, several at a time, and resumes
+# an interrupted upload from the ranges the server already has.
+#
+#   uvicorn main:app --app-dir app
+#   python app/upload_client.py big.iso --parallel 4
+#   python app/upload_client.py big.iso --resume <upload_id>     # after a disconnect
+import argparse
+import asyncio
+import hashlib
+import os
+
+import httpx
+
+
+def missing_ranges(size: int, received: list, chunk_size: int):
+    position = 0
+    for start, end in received + [[size, size]]:
+        while position < start:
+            yield position, min(position + chunk_size, start)
+            position = min(position + chunk_size, start)
+        position = max(position, end)
+
+
+async def send_chunk(client, upload_id, path, start, end, retries=3):
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    headers = {"X-Chunk-SHA256": hashlib.sha256(data).hexdigest()}
+    for attempt in range(retries):
+        try:
+            response = await client.patch(f"/uploads/{upload_id}", params={"offset": start}, content=data, headers=headers)
+            response.raise_for_status()
+            return
+        except httpx.HTTPError:
+            if attempt == retries - 1:
+                raise
+
+
+async def upload(client: httpx.AsyncClient, path: str, chunk_size=8 * 1024 * 1024, parallel=4, upload_id=None):
+    size = os.path.getsize(path)
+    if upload_id is None:
+        response = await client.post("/uploads/", json={"filename": os.path.basename(path), "size": size})
+    else:
+        response = await client.get(f"/uploads/{upload_id}")
+    response.raise_for_status()
+    session = response.json()
+
+    chunks = list(missing_ranges(size, session["received"], chunk_size))
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def send(start, end):
+        async with semaphore:
+            await send_chunk(client, session["upload_id"], path, start, end)
+
+    await asyncio.gather(*(send(start, end) for start, end in chunks))
+    response = await client.post(f"/uploads/{session['upload_id']}/complete")
+    response.raise_for_status()
+    return response.json()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--chunk-size", type=int, default=8 * 1024 * 1024)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--resume", metavar="UPLOAD_ID")
+    args = parser.parse_args()
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        print(await upload(client, args.path, args.chunk_size, args.parallel, args.resume))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,288 @@
+import hashlib
+import os
+import threading
+import uuid
+
+import anyio
+from fastapi import HTTPException, UploadFile
+
+# fsync policies: never (leave it to the OS), close (once per file), chunk (after every chunk)
+FSYNC_NEVER, FSYNC_CLOSE, FSYNC_CHUNK = "never", "close", "chunk"
+
+# content store inside the upload directory: .objects/<first 2 hex digits>/<sha256>
+OBJECTS_DIRECTORY = ".objects"
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, filename: str, max_size: int):
+        super().__init__(f"{filename} is larger than {max_size} bytes")
+        self.filename = filename
+        self.max_size = max_size
+
+
+class ChecksumMismatch(Exception):
+    def __init__(self, filename: str, expected: str, actual: str):
+        super().__init__(f"{filename}: sha256 is {actual}, expected {expected}")
+        self.filename = filename
+        self.expected = expected
+        self.actual = actual
+
+
+def fsync_directory(path: str):
+    directory = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+# Upload sink
+# `open()` + `shutil.copyfileobj()` inside an `async def` handler run on the event loop,
+# so every other request waits until the whole file is on disk. Here the copy loop runs in
+# a worker thread (anyio's threadpool), one thread hop per file instead of one per chunk.
+#
+# Content is stored once, under its SHA-256: the hash is updated chunk by chunk while the
+# upload is read (no second pass), and `uploads/{filename}` is a hard link to
+# `uploads/.objects/ab/abcd...`. The object's link count is its reference count.
+# The first `dedup_buffer` bytes are only kept in memory, so a duplicate that fits in it
+# is never written at all; a larger one is dropped before any fsync / rename.
+# New content goes to a temp file next to the upload directory (same file system) and is
+# linked into place once complete, so `uploads/` never shows a partial file.
+class UploadSink:
+    def __init__(
+        self, directory="uploads", chunk_size=1024 * 1024, fsync=FSYNC_NEVER, max_size=None,
+        concurrency=8, temp_directory=None, dedup_buffer=8 * 1024 * 1024,
+    ):
+        if fsync not in (FSYNC_NEVER, FSYNC_CLOSE, FSYNC_CHUNK):
+            raise ValueError(f"unknown fsync policy {fsync!r}")
+        self.directory = directory
+        self.objects_directory = os.path.join(directory, OBJECTS_DIRECTORY)
+        self.chunk_size = chunk_size
+        self.fsync = fsync
+        self.max_size = max_size
+        # files of one request written at the same time (see save_many)
+        self.concurrency = concurrency
+        self.temp_directory = temp_directory or os.path.join(
+            os.path.dirname(os.path.abspath(directory)), f".{os.path.basename(directory)}.tmp"
+        )
+        self.dedup_buffer = dedup_buffer
+        # held while an object is looked up / linked / collected, never while copying
+        self._objects_lock = threading.Lock()
+
+    # RAM _copy() can hold for one file: the chunks kept back while the content may still be a
+    # duplicate, and the chunk that goes past dedup_buffer (see UploadLimits)
+    @property
+    def buffer_size(self) -> int:
+        return self.dedup_buffer + self.chunk_size
+
+    # only the file name is kept, "../../etc/passwd" is saved as "passwd"
+    def path_for(self, filename: str) -> str:
+        name = os.path.basename((filename or "").replace("\\", "/"))
+        if name in ("", ".", "..", OBJECTS_DIRECTORY):
+            name = "upload"
+        return os.path.join(self.directory, name)
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_directory, digest[:2], digest)
+
+    # Number of file names pointing at the content, 0 if it isn't stored
+    def references(self, digest: str) -> int:
+        try:
+            return os.stat(self.object_path(digest)).st_nlink - 1
+        except FileNotFoundError:
+            return 0
+
+    # Delete the objects no file name points at anymore (a name was overwritten or removed),
+    # returns how many were deleted. Digests in `keep` are left alone even without a name
+    # (content something still reads, e.g. a picture waiting for its derivatives).
+    def collect_garbage(self, keep=()) -> int:
+        removed = 0
+        if not os.path.isdir(self.objects_directory):
+            return removed
+        with self._objects_lock:
+            for prefix in os.scandir(self.objects_directory):
+                for entry in os.scandir(prefix.path):
+                    if entry.stat().st_nlink == 1 and entry.name not in keep:
+                        os.remove(entry.path)
+                        removed += 1
+        return removed
+
+    # collect_garbage() in a worker thread every `interval` seconds, until cancelled
+    # (started in the app's lifespan)
+    async def collect_garbage_every(self, interval: float, keep=()):
+        while True:
+            await anyio.sleep(interval)
+            await anyio.to_thread.run_sync(self.collect_garbage, keep)
+
+    def _open_temp(self):
+        os.makedirs(self.temp_directory, exist_ok=True)
+        temp_path = os.path.join(self.temp_directory, f"{uuid.uuid4().hex}.part")
+        return temp_path, open(temp_path, "wb")
+
+    def _write(self, target, chunk: bytes):
+        target.write(chunk)
+        if self.fsync == FSYNC_CHUNK:
+            target.flush()
+            os.fsync(target.fileno())
+
+    # Point `path` at the object (atomically replacing whatever the name pointed at before)
+    def _link(self, object_path: str, path: str):
+        try:
+            if os.path.samefile(object_path, path):
+                return
+        except FileNotFoundError:
+            pass
+        link_path = os.path.join(self.temp_directory, f"{uuid.uuid4().hex}.link")
+        os.link(object_path, link_path)
+        os.replace(link_path, path)
+
+    # Runs in a worker thread: hash `source` while copying it chunk by chunk and store it
+    # under its digest, returns (size, digest, duplicate).
+    # `progress` (optional dict) gets the bytes read so far under "written".
+    def _copy(self, source, path: str, filename: str, progress=None):
+        os.makedirs(self.directory, exist_ok=True)
+        os.makedirs(self.temp_directory, exist_ok=True)
+        if progress is not None:
+            progress["status"] = "writing"
+        digest = hashlib.sha256()
+        buffered = []  # chunks not written yet (while size <= dedup_buffer)
+        temp_path = target = None
+        size = 0
+        try:
+            while chunk := source.read(self.chunk_size):
+                size += len(chunk)
+                if self.max_size is not None and size > self.max_size:
+                    raise UploadTooLarge(filename, self.max_size)
+                digest.update(chunk)
+                if target is None:
+                    buffered.append(chunk)
+                    if size <= self.dedup_buffer:
+                        continue
+                    temp_path, target = self._open_temp()
+                    for pending in buffered:
+                        self._write(target, pending)
+                    buffered = None
+                else:
+                    self._write(target, chunk)
+                if progress is not None:
+                    progress["written"] = size
+            digest = digest.hexdigest()
+            object_path = self.object_path(digest)
+
+            with self._objects_lock:
+                duplicate = os.path.exists(object_path)
+                if duplicate:
+                    self._link(object_path, path)
+            if not duplicate:
+                if target is None:
+                    temp_path, target = self._open_temp()
+                    for pending in buffered:
+                        self._write(target, pending)
+                if self.fsync == FSYNC_CLOSE:
+                    target.flush()
+                    os.fsync(target.fileno())
+                target.close()
+                duplicate = self._commit(temp_path, object_path, path)
+            if progress is not None:
+                progress["written"] = size
+        finally:
+            # the temp file is never kept: its content is linked as the object, or not needed
+            if target is not None:
+                target.close()
+                os.remove(temp_path)
+        self._sync_links(object_path, duplicate)
+        return size, digest, duplicate
+
+    # Link the complete temp file as the object (unless the content is stored already)
+    # and `path` to the object, returns whether it was a duplicate
+    def _commit(self, temp_path: str, object_path: str, path: str) -> bool:
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        with self._objects_lock:
+            try:
+                os.link(temp_path, object_path)
+                duplicate = False
+            except FileExistsError:
+                # the same content was stored by a concurrent upload meanwhile
+                duplicate = True
+            self._link(object_path, path)
+        return duplicate
+
+    def _sync_links(self, object_path: str, duplicate: bool):
+        if self.fsync != FSYNC_NEVER:
+            # make the links themselves durable
+            if not duplicate:
+                fsync_directory(os.path.dirname(object_path))
+            fsync_directory(self.directory)
+
+    # Runs in a worker thread: store a complete file that is already on disk (e.g. assembled
+    # from chunks) under its digest; `temp_path` must be in `temp_directory` and is removed.
+    # With `sha256`, content that doesn't match it isn't stored (and the temp file is kept).
+    def _store(self, temp_path: str, path: str, sha256=None):
+        digest = hashlib.sha256()
+        size = 0
+        with open(temp_path, "rb") as source:
+            while chunk := source.read(self.chunk_size):
+                size += len(chunk)
+                digest.update(chunk)
+            digest = digest.hexdigest()
+            if sha256 is not None and digest != sha256.lower():
+                raise ChecksumMismatch(os.path.basename(path), sha256, digest)
+            if self.fsync != FSYNC_NEVER:
+                os.fsync(source.fileno())
+        os.makedirs(self.directory, exist_ok=True)
+        object_path = self.object_path(digest)
+        try:
+            duplicate = self._commit(temp_path, object_path, path)
+        finally:
+            os.remove(temp_path)
+        self._sync_links(object_path, duplicate)
+        return size, digest, duplicate
+
+    async def store_file(self, temp_path: str, filename: str, content_type=None, sha256=None) -> dict:
+        path = self.path_for(filename)
+        size, digest, duplicate = await anyio.to_thread.run_sync(self._store, temp_path, path, sha256)
+        return {
+            "filename": os.path.basename(path), "content_type": content_type, "size": size,
+            "sha256": digest, "duplicate": duplicate,
+        }
+
+    async def _save(self, file: UploadFile, progress=None, limiter=None) -> dict:
+        path = self.path_for(file.filename)
+        await file.seek(0)
+        size, digest, duplicate = await anyio.to_thread.run_sync(
+            self._copy, file.file, path, file.filename, progress, limiter=limiter
+        )
+        return {
+            "filename": os.path.basename(path), "content_type": file.content_type, "size": size,
+            "sha256": digest, "duplicate": duplicate,
+        }
+
+    async def save(self, file: UploadFile) -> dict:
+        try:
+            return await self._save(file)
+        except UploadTooLarge as exc:
+            raise HTTPException(status_code=413, detail=str(exc)) from None
+
+    # Save several files, at most `concurrency` at a time; one failing file doesn't stop the others.
+    # `progress` (optional list) gets one dict per file, updated while the files are written.
+    # Returns one result per file, in order: the saved file or {"filename", "status": "failed", "error"}
+    async def save_many(self, files: list[UploadFile], concurrency=None, progress=None) -> list[dict]:
+        limiter = anyio.CapacityLimiter(concurrency or self.concurrency)
+        results = [None] * len(files)
+        states = [{"filename": file.filename, "size": file.size, "written": 0, "status": "pending"} for file in files]
+        if progress is not None:
+            progress.extend(states)
+
+        async def save_one(index, file):
+            state = states[index]
+            try:
+                results[index] = {**await self._save(file, state, limiter), "status": "saved"}
+                state["status"] = "saved"
+            except (UploadTooLarge, OSError) as exc:
+                results[index] = {"filename": file.filename, "status": "failed", "error": str(exc)}
+                state["status"] = "failed"
+
+        async with anyio.create_task_group() as group:
+            for index, file in enumerate(files):
+                group.start_soon(save_one, index, file)
+        return results
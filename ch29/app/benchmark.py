@@ -0,0 +1,54 @@
+# Benchmark: writing a batch of uploaded files one after another vs in parallel
+# UploadSink.save_many() with concurrency=1 (the old loop) and concurrency=8, for
+# different file counts and sizes, with fsync once per file (FSYNC_CLOSE) as durable
+# storage would need it. Only the persistence step is timed (files are already received).
+# Run from the ch29 folder: python app/benchmark.py
+import asyncio
+import io
+import os
+import tempfile
+import time
+
+from fastapi import UploadFile
+
+from uploads import FSYNC_CLOSE, UploadSink
+
+COUNTS = [10, 50, 200]
+SIZES = [64 * 1024, 1024 * 1024]
+
+
+# different content per file and per run (its own first bytes), or the sink would store
+# the content once and only link the other files to it
+def make_files(count, payload, run):
+    files = []
+    for i in range(count):
+        content = f"{run}-{i}".encode().ljust(16) + payload[16:]
+        files.append(UploadFile(io.BytesIO(content), size=len(content), filename=f"file{i}.bin"))
+    return files
+
+
+async def timed(sink, files, concurrency):
+    start = time.perf_counter()
+    results = await sink.save_many(files, concurrency=concurrency)
+    assert all(result["status"] == "saved" and not result["duplicate"] for result in results)
+    return time.perf_counter() - start
+
+
+async def main():
+    print(f"{'files':>5} | {'size':>7} | {'sequential':>10} | {'parallel (8)':>12} | speedup")
+    for size in SIZES:
+        payload = os.urandom(size)
+        for count in COUNTS:
+            # on the same disk as the project, /tmp can be a tmpfs where fsync is free
+            with tempfile.TemporaryDirectory(dir=".") as directory:
+                sink = UploadSink(os.path.join(directory, "uploads"), fsync=FSYNC_CLOSE)
+                sequential = await timed(sink, make_files(count, payload, "sequential"), 1)
+                parallel = await timed(sink, make_files(count, payload, "parallel"), 8)
+            print(
+                f"{count:>5} | {size // 1024:>4} KB | {sequential:8.2f} s | {parallel:10.2f} s | "
+                f"{sequential / parallel:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
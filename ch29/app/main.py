@@ -1,10 +1,52 @@
-from fastapi import FastAPI, File, UploadFile
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
 from fastapi.responses import HTMLResponse
 from typing import Annotated
-import os
-import shutil
 
-app = FastAPI()
+from upload_limits import UploadLimits, UploadSettings
+from uploads import FSYNC_NEVER, UploadSink
+
+# Objects no file name points at anymore are deleted in the background (see UploadSink.collect_garbage)
+GARBAGE_COLLECTION_INTERVAL = 3600.0
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    collector = asyncio.create_task(UPLOADS.collect_garbage_every(GARBAGE_COLLECTION_INTERVAL))
+    yield
+    collector.cancel()
+
+app = FastAPI(lifespan=lifespan)
+
+# Upload limits of this app (each one can be overridden with UPLOAD_<NAME> environment variables)
+UPLOAD_SETTINGS = UploadSettings.from_env(
+    spool_size=1024 * 1024,                 # bytes of a file kept in RAM, the rest is spooled to disk
+    max_file_size=100 * 1024 * 1024,
+    max_files=1000,                         # files per request
+    max_in_flight_bytes=64 * 1024 * 1024,   # RAM all uploads of this worker may hold at once
+    queue_timeout=10.0,                     # seconds an upload waits for the budget, then 503
+)
+
+# Uploads are written by a worker thread, the event loop keeps serving other requests
+# Each file being written holds up to dedup_buffer + chunk_size in RAM:
+# (4 + 1) MB x 8 files = 40 MB of the 64 MB budget, the rest is left for the spools.
+UPLOADS = UploadSink(
+    "uploads",
+    chunk_size=1024 * 1024,   # bytes per read / write
+    fsync=FSYNC_NEVER,        # or FSYNC_CLOSE / FSYNC_CHUNK for durability
+    max_size=UPLOAD_SETTINGS.max_file_size,
+    concurrency=8,            # files of one request written in parallel
+    dedup_buffer=4 * 1024 * 1024,
+)
+
+# Multipart requests go through the limits: spools + the sink's buffers count against the budget
+UPLOAD_LIMITS = UploadLimits(UPLOAD_SETTINGS, handler_buffer=UPLOADS.buffer_size, handler_concurrency=UPLOADS.concurrency)
+app.router.route_class = UPLOAD_LIMITS.route_class
+
+# batch_id -> per-file progress of the last MAX_TRACKED_BATCHES uploads
+MAX_TRACKED_BATCHES = 1000
+UPLOAD_PROGRESS = OrderedDict()
 
 
 # HTML form for testing
@@ -24,13 +66,33 @@ async def main():
 
 
 
+# @app.post("/uploadfiles/")
+# async def create_upload_file(files: Annotated[list[UploadFile], File()]):
+#     save_files = []
+#     for file in files:
+#         saved = await UPLOADS.save(file)
+#         save_files.append({"filename" : saved["filename"], "size" : saved["size"]})
+#     return save_files
+
+# Files are written in parallel (at most UPLOADS.concurrency at a time).
+# With ?batch_id=... the progress of every file can be followed at /uploadfiles/{batch_id}
 @app.post("/uploadfiles/")
-async def create_upload_file(files: Annotated[list[UploadFile], File()]):
-    save_files = []
-    os.makedirs("uploads", exist_ok=True)
-    for file in files:
-        save_path = f"uploads/{file.filename}"
-        with open(save_path,"wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        save_files.append({"filename" : file.filename})
-    return save_files
\ No newline at end of file
+async def create_upload_file(
+    files: Annotated[list[UploadFile], File()],
+    batch_id: Annotated[str | None, Query(max_length=64)] = None,
+):
+    progress = None
+    if batch_id:
+        progress = UPLOAD_PROGRESS[batch_id] = []
+        if len(UPLOAD_PROGRESS) > MAX_TRACKED_BATCHES:
+            UPLOAD_PROGRESS.popitem(last=False)
+    results = await UPLOADS.save_many(files, progress=progress)
+    failed = sum(result["status"] == "failed" for result in results)
+    return {"saved": len(results) - failed, "failed": failed, "files": results}
+
+@app.get("/uploadfiles/{batch_id}")
+async def upload_progress(batch_id: str):
+    progress = UPLOAD_PROGRESS.get(batch_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Unknown batch")
+    return {"batch_id": batch_id, "files": progress}
@@ -0,0 +1,80 @@
+# Derivative pipeline throughput: the same batch of photos rendered by 1, 2, 4, ... worker processes
+#
+#   python app/benchmark.py [--images 32] [--workers 1 2 4 8]
+import argparse
+import asyncio
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from PIL import Image  # noqa: E402
+
+from derivatives import DerivativePipeline  # noqa: E402
+
+
+# JPEG "photos" (12 MP, fractal + noise so they don't compress to nothing)
+def make_photos(directory: str, count: int, size=(4000, 3000)):
+    paths = []
+    noise = Image.effect_noise(size, 40).convert("RGB")
+    for index in range(count):
+        fractal = Image.effect_mandelbrot(size, (-2.2 + index * 0.01, -1.2, 1.0, 1.2), 64).convert("RGB")
+        photo = Image.blend(fractal, noise, 0.3)
+        path = os.path.join(directory, f"photo{index}.jpg")
+        buffer = io.BytesIO()
+        photo.save(buffer, "JPEG", quality=90)
+        with open(path, "wb") as file:
+            file.write(buffer.getvalue())
+        paths.append(path)
+    return paths
+
+
+async def run(photos, workers: int, directory: str) -> float:
+    pipeline = DerivativePipeline(directory, workers=workers, max_queue=len(photos))
+    await pipeline.start()
+    try:
+        # warm up the pool (process start + imports aren't part of the throughput)
+        await asyncio.gather(*(
+            asyncio.get_running_loop().run_in_executor(pipeline._pool, os.getpid) for _ in range(workers)
+        ))
+        start = time.perf_counter()
+        for index, path in enumerate(photos):
+            pipeline.submit(f"{index:064x}", path)
+        await pipeline.queue.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        await pipeline.stop()
+    failed = [job.error for job in pipeline.jobs.values() if job.status != "done"]
+    if failed:
+        raise RuntimeError(failed[0])
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        photos = make_photos(directory, args.images)
+        print(f"{args.images} photos 4000x3000 JPEG, {os.cpu_count()} CPUs\n")
+        print(f"{'workers':>7} | {'time':>8} | {'images/s':>8} | speedup")
+        baseline = None
+        for workers in args.workers:
+            output = os.path.join(directory, f"derivatives-{workers}")
+            elapsed = await run(photos, workers, output)
+            baseline = baseline or elapsed
+            print(f"{workers:>7} | {elapsed:>6.2f} s | {len(photos) / elapsed:>8.1f} | {baseline / elapsed:.1f}x")
+            shutil.rmtree(output)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import uuid
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# name -> (max width, max height, format, save options)
+DERIVATIVES = {
+    "thumb_64": (64, 64, "WEBP", {"quality": 80}),
+    "thumb_256": (256, 256, "WEBP", {"quality": 80}),
+    "web": (1280, 1280, "WEBP", {"quality": 82, "method": 4}),
+    "web_jpeg": (1280, 1280, "JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
+
+# larger images are refused instead of decoded (decompression bombs); Pillow only warns
+# up to twice the limit, render() turns that warning into an error
+MAX_IMAGE_PIXELS = 50_000_000
+
+QUEUED, RUNNING, DONE, FAILED, REJECTED = "queued", "running", "done", "failed", "rejected"
+
+
+def derivative_filename(name: str) -> str:
+    return f"{name}.{EXTENSIONS[DERIVATIVES[name][2]]}"
+
+
+# Runs in a worker process: every derivative of one image, returns name -> file size.
+# The image is decoded once; thumbnail() lets the JPEG decoder downscale while decoding
+# (draft mode), so a 24 MP photo isn't fully decoded for a 1280 px version.
+def render(source: str, directory: str) -> dict:
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    warnings.simplefilter("error", Image.DecompressionBombWarning)
+    os.makedirs(directory, exist_ok=True)
+    sizes = {}
+    with Image.open(source) as original:
+        largest = max(max(width, height) for width, height, _, _ in DERIVATIVES.values())
+        original.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+        # largest first, every smaller version is resized from the previous one
+        for name, (width, height, image_format, options) in sorted(
+            DERIVATIVES.items(), key=lambda item: -item[1][0] * item[1][1]
+        ):
+            image = image.copy()
+            image.thumbnail((width, height), Image.Resampling.LANCZOS)
+            target = image.convert("RGB") if image_format == "JPEG" and image.mode != "RGB" else image
+            path = os.path.join(directory, derivative_filename(name))
+            temp_path = f"{path}.{uuid.uuid4().hex}.part"
+            target.save(temp_path, image_format, **options)
+            os.replace(temp_path, path)
+            sizes[name] = os.path.getsize(path)
+    return sizes
+
+
+class DerivativeJob:
+    __slots__ = ("digest", "source", "status", "files", "error")
+
+    def __init__(self, digest: str, source: str):
+        self.digest = digest
+        self.source = source
+        self.status = QUEUED
+        self.files = {}
+        self.error = None
+
+    def info(self) -> dict:
+        return {"digest": self.digest, "status": self.status, "files": self.files, "error": self.error}
+
+
+# Derivative pipeline
+# Resizing and re-encoding are CPU bound, in the request they would hold the event loop
+# (or, in a thread, the GIL) for hundreds of milliseconds per picture. Jobs go to a bounded
+# queue instead, `workers` dispatcher tasks hand them to a process pool, one job per process.
+# Jobs are keyed by the content digest (see UploadSink): the same picture uploaded again
+# (by anyone, under any name) is rendered once; a full queue rejects the job, the request
+# itself still succeeds.
+class DerivativePipeline:
+    def __init__(self, directory="derivatives", workers=None, max_queue=100, max_tracked_jobs=10_000):
+        self.directory = directory
+        self.workers = workers or os.cpu_count() or 1
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.max_tracked_jobs = max_tracked_jobs
+        self.jobs = OrderedDict()  # digest -> DerivativeJob (queued / running ones and the latest finished)
+        # digests of the queued / running jobs: their source must stay on disk until rendered
+        self.pending = set()
+        self._pool = None
+        self._dispatchers = []
+
+    def directory_for(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    async def start(self):
+        # spawn: forking a process that runs an event loop and threads isn't safe
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._pool.shutdown(cancel_futures=True)
+
+    def _rendered(self, digest: str) -> dict:
+        directory = self.directory_for(digest)
+        files = {}
+        for name in DERIVATIVES:
+            path = os.path.join(directory, derivative_filename(name))
+            if not os.path.exists(path):
+                return {}
+            files[name] = os.path.getsize(path)
+        return files
+
+    def _track(self, job: DerivativeJob):
+        self.jobs[job.digest] = job
+        self.jobs.move_to_end(job.digest)
+        while len(self.jobs) > self.max_tracked_jobs:
+            oldest = next(iter(self.jobs.values()))
+            if oldest.status in (QUEUED, RUNNING):
+                break
+            self.jobs.popitem(last=False)
+
+    # Queue the derivatives of a stored picture, returns its job (not waited for)
+    def submit(self, digest: str, source: str) -> DerivativeJob:
+        job = self.jobs.get(digest)
+        if job is not None and job.status in (QUEUED, RUNNING, DONE):
+            return job
+        job = DerivativeJob(digest, source)
+        files = self._rendered(digest)
+        if files:
+            job.status, job.files = DONE, files
+        else:
+            try:
+                self.queue.put_nowait(job)
+                self.pending.add(digest)
+            except asyncio.QueueFull:
+                job.status, job.error = REJECTED, "derivative queue is full, upload the picture again later"
+        self._track(job)
+        return job
+
+    def status(self, digest: str):
+        job = self.jobs.get(digest)
+        if job is not None:
+            return job
+        files = self._rendered(digest)
+        if not files:
+            return None
+        job = DerivativeJob(digest, None)
+        job.status, job.files = DONE, files
+        return job
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job.status = RUNNING
+            try:
+                job.files = await loop.run_in_executor(self._pool, render, job.source, self.directory_for(job.digest))
+                job.status = DONE
+            except asyncio.CancelledError:
+                raise
+            except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+                job.status, job.error = FAILED, f"image is larger than {MAX_IMAGE_PIXELS} pixels"
+            except UnidentifiedImageError:
+                job.status, job.error = FAILED, "not a supported image"
+            except Exception:
+                # the details (paths, ...) stay in the log, the status is public
+                logger.exception("rendering derivatives of %s failed", job.digest)
+                job.status, job.error = FAILED, "rendering failed"
+            finally:
+                self.pending.discard(job.digest)
+                self.queue.task_done()
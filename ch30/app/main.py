@@ -1,10 +1,57 @@
-from fastapi import FastAPI, File, UploadFile, Form
-from fastapi.responses import HTMLResponse
-from typing import Annotated
+import asyncio
 import os
-import shutil
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, HTTPException, Path, UploadFile, Form
+from fastapi.responses import FileResponse, HTMLResponse
+from typing import Annotated
+
+from derivatives import DERIVATIVES, DerivativePipeline, derivative_filename
+from upload_limits import UploadLimits, UploadSettings
+from uploads import FSYNC_NEVER, UploadSink
+
+# Objects no file name points at anymore are deleted in the background (see UploadSink.collect_garbage),
+# except the pictures whose derivatives are still to be rendered
+GARBAGE_COLLECTION_INTERVAL = 3600.0
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await DERIVATIVES_PIPELINE.start()
+    collector = asyncio.create_task(
+        UPLOADS.collect_garbage_every(GARBAGE_COLLECTION_INTERVAL, keep=DERIVATIVES_PIPELINE.pending)
+    )
+    yield
+    collector.cancel()
+    await DERIVATIVES_PIPELINE.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+# Upload limits of this app (each one can be overridden with UPLOAD_<NAME> environment variables)
+UPLOAD_SETTINGS = UploadSettings.from_env(
+    spool_size=1024 * 1024,                 # bytes of a file kept in RAM, the rest is spooled to disk
+    max_file_size=100 * 1024 * 1024,
+    max_files=1,                            # files per request
+    max_in_flight_bytes=64 * 1024 * 1024,   # RAM all uploads of this worker may hold at once
+    queue_timeout=10.0,                     # seconds an upload waits for the budget, then 503
+)
+
+# Uploads are written by a worker thread, the event loop keeps serving other requests
+UPLOADS = UploadSink(
+    "uploads",
+    chunk_size=1024 * 1024,   # bytes per read / write
+    fsync=FSYNC_NEVER,        # or FSYNC_CLOSE / FSYNC_CHUNK for durability
+    max_size=UPLOAD_SETTINGS.max_file_size,
+)
+
+# Multipart requests go through the limits: spools + the sink's buffers count against the budget
+UPLOAD_LIMITS = UploadLimits(UPLOAD_SETTINGS, handler_buffer=UPLOADS.buffer_size)
+app.router.route_class = UPLOAD_LIMITS.route_class
 
-app = FastAPI()
+# Thumbnails / web versions of the profile pictures, rendered by worker processes
+DERIVATIVES_PIPELINE = DerivativePipeline(
+    "derivatives",
+    workers=os.cpu_count(),   # worker processes
+    max_queue=100,            # pictures waiting; above that a job is rejected
+)
 
 @app.get("/", response_class=HTMLResponse)
 async def get_form():
@@ -32,12 +79,31 @@ async def create_user_with_file(
 ):
     response = {"username": username}
     if file:
-        save_path = f"uploads/{file.filename}"
-        os.makedirs("uploads", exist_ok=True)
-        with open(save_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        response["filename"] = file.filename
+        saved = await UPLOADS.save(file)
+        response["filename"] = saved["filename"]
+        response["sha256"] = saved["sha256"]
+        # the original is stored, the derivatives are rendered in the background
+        if (file.content_type or "").startswith("image/"):
+            job = DERIVATIVES_PIPELINE.submit(saved["sha256"], UPLOADS.object_path(saved["sha256"]))
+            response["derivatives"] = {"status": job.status, "url": f"/derivatives/{saved['sha256']}"}
     return response
 
+Digest = Annotated[str, Path(pattern="^[0-9a-f]{64}$")]
 
+@app.get("/derivatives/{digest}")
+async def derivatives_status(digest: Digest):
+    job = DERIVATIVES_PIPELINE.status(digest)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown picture")
+    info = job.info()
+    info["files"] = {name: {"size": size, "url": f"/derivatives/{digest}/{name}"} for name, size in job.files.items()}
+    return info
 
+@app.get("/derivatives/{digest}/{name}")
+async def derivative_file(digest: Digest, name: str):
+    if name not in DERIVATIVES:
+        raise HTTPException(status_code=404, detail="Unknown derivative")
+    path = os.path.join(DERIVATIVES_PIPELINE.directory_for(digest), derivative_filename(name))
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Not rendered (yet)")
+    return FileResponse(path)
@@ -0,0 +1,232 @@
+import asyncio
+import math
+import os
+from collections import deque
+
+from fastapi import HTTPException, Request
+from fastapi.routing import APIRoute
+from python_multipart.multipart import parse_options_header
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+
+class FileTooLarge(MultiPartException):
+    pass
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+# Upload settings of one app
+#   spool_size           bytes of each uploaded file kept in RAM, the rest goes to a temp file on disk
+#   max_file_size        larger files are refused (413) while the body is parsed, before they hit the disk
+#   max_files            files per request (400 above it)
+#   max_in_flight_bytes  RAM all uploads of this worker may hold at once (see ByteBudget)
+#   queue_timeout        seconds an upload may wait for its share of the budget before a 503
+# Every value can come from the environment: UPLOAD_SPOOL_SIZE, UPLOAD_MAX_FILE_SIZE, ...
+class UploadSettings:
+    def __init__(
+        self, spool_size=1024 * 1024, max_file_size=100 * 1024 * 1024, max_files=10,
+        max_in_flight_bytes=64 * 1024 * 1024, queue_timeout=10.0,
+    ):
+        if spool_size > max_in_flight_bytes:
+            raise ValueError("spool_size can't be larger than max_in_flight_bytes")
+        self.spool_size = spool_size
+        self.max_file_size = max_file_size
+        self.max_files = max_files
+        self.max_in_flight_bytes = max_in_flight_bytes
+        self.queue_timeout = queue_timeout
+
+    @classmethod
+    def from_env(cls, **defaults):
+        settings = {}
+        for name, convert in (
+            ("spool_size", int), ("max_file_size", int), ("max_files", int),
+            ("max_in_flight_bytes", int), ("queue_timeout", float),
+        ):
+            value = os.environ.get(f"UPLOAD_{name.upper()}")
+            if value is not None:
+                settings[name] = convert(value)
+            elif name in defaults:
+                settings[name] = defaults[name]
+        return cls(**settings)
+
+
+# In-flight bytes budget
+# An upload reserves the RAM it can hold before its body is read and gives it back when the
+# handler is done. When the budget is used up, the next uploads wait in line (FIFO, so a large
+# one isn't starved by small ones) without reading their body: the server stops reading the
+# socket and the clients are slowed down by TCP instead of the worker buffering for them.
+# Waiting longer than the timeout raises BudgetExceeded (-> 503).
+class ByteBudget:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self.rejected = 0
+        self._waiters = deque()  # (amount, future)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, amount: int, timeout=None) -> int:
+        amount = min(amount, self.limit)
+        if not self._waiters and self.used + amount <= self.limit:
+            self._grant(amount)
+            return amount
+        future = asyncio.get_running_loop().create_future()
+        waiter = (amount, future)
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except BaseException as exc:
+            if future.done() and not future.cancelled():
+                # granted just as we gave up
+                self.release(amount)
+            else:
+                self._waiters.remove(waiter)
+                self._wake()
+            if isinstance(exc, TimeoutError):
+                self.rejected += 1
+                raise BudgetExceeded(f"upload memory budget of {self.limit} bytes is used up") from None
+            raise
+        return amount
+
+    def release(self, amount: int):
+        self.used -= amount
+        self._wake()
+
+    def _grant(self, amount: int):
+        self.used += amount
+        self.peak = max(self.peak, self.used)
+
+    def _wake(self):
+        while self._waiters and self.used + self._waiters[0][0] <= self.limit:
+            amount, future = self._waiters.popleft()
+            if not future.done():
+                self._grant(amount)
+                future.set_result(None)
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "used": self.used, "peak": self.peak, "waiting": self.waiting, "rejected": self.rejected}
+
+
+# Starlette's parser with the app's spool size, counting every file's bytes as they arrive.
+# `spool_allowance` is the RAM the spools of the whole request may use (None: a spool per file);
+# once it is used up, the next files go to disk right away.
+class LimitedMultiPartParser(MultiPartParser):
+    def __init__(self, headers, stream, settings: UploadSettings, spool_allowance=None, **kwargs):
+        super().__init__(headers, stream, max_files=settings.max_files, **kwargs)
+        self.spool_size = self.spool_max_size = settings.spool_size
+        self.spool_allowance = spool_allowance
+        self.max_file_size = settings.max_file_size
+        self._current_file_size = 0
+
+    def on_part_begin(self):
+        super().on_part_begin()
+        self._current_file_size = 0
+
+    def on_headers_finished(self):
+        if self.spool_allowance is not None:
+            # at least 1: a SpooledTemporaryFile with max_size=0 never rolls over
+            self.spool_max_size = max(1, min(self.spool_size, self.spool_allowance))
+        super().on_headers_finished()
+
+    def on_part_end(self):
+        if self._current_part.file is not None and self.spool_allowance is not None:
+            self.spool_allowance -= min(self._current_file_size, self.spool_max_size)
+        super().on_part_end()
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._current_part.file is not None:
+            self._current_file_size += end - start
+            if self._current_file_size > self.max_file_size:
+                raise FileTooLarge(f"{self._current_part.file.filename} is larger than {self.max_file_size} bytes")
+        super().on_part_data(data, start, end)
+
+
+class LimitedRequest(Request):
+    settings: UploadSettings
+    spool_allowance = None
+
+    # Request._get_form with LimitedMultiPartParser
+    async def _get_form(self, *, max_files=1000, max_fields=1000, max_part_size=1024 * 1024):
+        if self._form is None:
+            content_type, _ = parse_options_header(self.headers.get("Content-Type"))
+            if content_type != b"multipart/form-data":
+                return await super()._get_form(max_files=max_files, max_fields=max_fields, max_part_size=max_part_size)
+            parser = LimitedMultiPartParser(
+                self.headers, self.stream(), self.settings, self.spool_allowance,
+                max_fields=max_fields, max_part_size=max_part_size,
+            )
+            try:
+                self._form = await parser.parse()
+            except FileTooLarge as exc:
+                raise HTTPException(status_code=413, detail=exc.message) from None
+            except MultiPartException as exc:
+                raise HTTPException(status_code=400, detail=exc.message) from None
+        return self._form
+
+
+# Upload limits of one app
+#   UPLOAD_LIMITS = UploadLimits(UploadSettings(...), handler_buffer=UPLOADS.buffer_size)
+#   app.router.route_class = UPLOAD_LIMITS.route_class   (before the routes are declared)
+# Multipart requests of those routes are parsed with the settings and go through the budget,
+# everything else is left alone.
+# `handler_buffer` is the RAM the handler holds per file on top of the spool while it stores
+# the file (UploadSink.buffer_size), `handler_concurrency` how many files it stores at once.
+# Those buffers have to fit in the budget, it couldn't hold them otherwise.
+class UploadLimits:
+    def __init__(self, settings: UploadSettings, handler_buffer=0, handler_concurrency=1):
+        if handler_buffer * min(settings.max_files, handler_concurrency) > settings.max_in_flight_bytes:
+            raise ValueError("handler_buffer x handler_concurrency can't be larger than max_in_flight_bytes")
+        self.settings = settings
+        self.handler_buffer = handler_buffer
+        self.handler_concurrency = handler_concurrency
+        self.budget = ByteBudget(settings.max_in_flight_bytes)
+        limits = self
+
+        class LimitedRoute(APIRoute):
+            def get_route_handler(self):
+                handler = super().get_route_handler()
+
+                async def limited_handler(request: Request):
+                    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+                        return await handler(request)
+                    request = LimitedRequest(request.scope, request.receive)
+                    request.settings = limits.settings
+                    return await limits.handle(handler, request)
+
+                return limited_handler
+
+        self.route_class = LimitedRoute
+
+    # RAM the request can hold: the spooled part of its files (its body, but no more than one
+    # spool per file) + the handler's buffers for the files it stores at once (no more than the body).
+    # Returns both parts, the sum is taken from the budget.
+    def reservation(self, request: Request) -> tuple[int, int]:
+        settings = self.settings
+        try:
+            content_length = int(request.headers["content-length"])
+        except (KeyError, ValueError):
+            content_length = math.inf
+        spools = min(content_length, settings.spool_size * settings.max_files)
+        buffers = min(content_length, self.handler_buffer * min(settings.max_files, self.handler_concurrency))
+        return spools, buffers
+
+    async def handle(self, handler, request: LimitedRequest):
+        spools, buffers = self.reservation(request)
+        try:
+            # at most the whole budget: a larger request gets it all
+            amount = await self.budget.acquire(spools + buffers, self.settings.queue_timeout)
+        except BudgetExceeded as exc:
+            raise HTTPException(
+                status_code=503, detail=str(exc), headers={"Retry-After": str(math.ceil(self.settings.queue_timeout))}
+            ) from None
+        # the spools only get what is left once the handler's buffers are counted
+        request.spool_allowance = max(amount - buffers, 0)
+        try:
+            return await handler(request)
+        finally:
+            self.budget.release(amount)
@@ -0,0 +1,103 @@
+# Benchmark: throughput of 404s for ids that don't exist
+# The ASGI app is called directly (no server, no client), so only what the app does per
+# request is measured:
+#   before   HTTPException raised in the handler, turned into a JSONResponse by FastAPI
+#   after    the pre-built 404, returned without raising (main.py)
+# and then the lookup alone, where a Bloom filter pays off: in front of a store that is
+# more expensive to ask than a dict (SQLite here, a database / remote cache in practice).
+# Run from the ch31 folder: python app/benchmark.py
+import asyncio
+import sqlite3
+import time
+
+from fastapi import FastAPI, HTTPException
+
+import main
+from negative_cache import KeyFilter
+
+REQUESTS = 20_000
+ITEMS = 100_000
+LOOKUPS = 200_000
+
+
+def before_app(items):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_items(item_id: str):
+        if item_id not in items:
+            raise HTTPException(
+                status_code=404,
+                detail= "Item not found",
+                headers={"x-error-type" : "itemmissing"}
+                )
+        return items[item_id]
+
+    return app
+
+
+async def throughput(app, paths):
+    statuses = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    def scope(path):
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+            "query_string": b"", "headers": [(b"host", b"test")], "server": ("test", 80), "client": ("bot", 1234),
+        }
+
+    start = time.perf_counter()
+    for path in paths:
+        await app(scope(path), receive, send)
+    elapsed = time.perf_counter() - start
+    assert set(statuses) == {404}, set(statuses)
+    return len(paths) / elapsed
+
+
+def lookups_per_second(contains, keys):
+    start = time.perf_counter()
+    for key in keys:
+        contains(key)
+    return len(keys) / (time.perf_counter() - start)
+
+
+async def run():
+    for index in range(ITEMS):
+        main.items[f"item-{index}"] = f"item number {index}"
+    misses = [f"/items/bot-{index}" for index in range(REQUESTS)]
+
+    before = await throughput(before_app(main.items), misses)
+    after = await throughput(main.app, misses)
+    print(f"{REQUESTS} misses through the app ({ITEMS} items)\n")
+    print(f"before (HTTPException) | {before:9,.0f} req/s")
+    print(f"after (prebuilt 404)   | {after:9,.0f} req/s | {after / before:.1f}x")
+
+    database = sqlite3.connect(":memory:")
+    database.execute("CREATE TABLE items (id TEXT PRIMARY KEY, description TEXT)")
+    database.executemany("INSERT INTO items VALUES (?, ?)", main.items.items())
+    query = "SELECT 1 FROM items WHERE id = ?"
+    keys = [f"bot-{index}" for index in range(LOOKUPS)]
+    bloom = KeyFilter(main.items)
+
+    def sqlite_contains(key):
+        return database.execute(query, (key,)).fetchone() is not None
+
+    def filtered_sqlite_contains(key):
+        return key in bloom and sqlite_contains(key)
+
+    print(f"\n{LOOKUPS} lookups of missing keys\n")
+    print(f"dict                   | {lookups_per_second(main.items.__contains__, keys):12,.0f} /s")
+    print(f"bloom filter           | {lookups_per_second(bloom.__contains__, keys):12,.0f} /s")
+    print(f"sqlite                 | {lookups_per_second(sqlite_contains, keys):12,.0f} /s")
+    print(f"bloom filter + sqlite  | {lookups_per_second(filtered_sqlite_contains, keys):12,.0f} /s")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
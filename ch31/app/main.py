@@ -1,4 +1,6 @@
-from fastapi import FastAPI,HTTPException
+from fastapi import FastAPI
+
+from negative_cache import PrebuiltResponse
 
 app = FastAPI()
 
@@ -7,18 +9,33 @@ items = {
     'banana' : "a yellow delight"
 }
 
+# Misses (mostly bots asking for ids that don't exist) get a 404 that is built once
+# instead of raised per request. `items` is a dict, asking it is cheaper than any filter
+# in front of it (see negative_cache.KeyFilter for a slower store).
+ITEM_NOT_FOUND = PrebuiltResponse(
+    {"detail": "Item not found"},
+    status_code=404,
+    headers={"x-error-type" : "itemmissing"},
+)
+
 # @app.get("/items/{item_id}")
 # async def read_items(item_id: str):
 #     if item_id not in items:
 #         raise HTTPException(status_code=404,detail= "Item not found")
 #     return items[item_id]
 
-@app.get("/items/{item_id}")
+# @app.get("/items/{item_id}")
+# async def read_items(item_id: str):
+#     if item_id not in items:
+#         raise HTTPException(
+#             status_code=404,
+#             detail= "Item not found",
+#             headers={"x-error-type" : "itemmissing"}
+#             )
+#     return items[item_id]
+
+@app.get("/items/{item_id}", responses={404: {"description": "Item not found"}})
 async def read_items(item_id: str):
     if item_id not in items:
-        raise HTTPException(
-            status_code=404,
-            detail= "Item not found",
-            headers={"x-error-type" : "itemmissing"}
-            )
-    return items[item_id]
\ No newline at end of file
+        return ITEM_NOT_FOUND
+    return items[item_id]
@@ -0,0 +1,103 @@
+import json
+import math
+
+from starlette.responses import Response
+
+
+# Bloom filter over the keys that exist
+# `key in filter` is False only for keys that were never added, so a miss is answered
+# without touching the store; a True may be a false positive (error_rate), the store decides.
+# Positions come from Python's hash() (double hashing: h1 + i * h2), the filter lives in
+# memory and is rebuilt on every start, so the per-process hash seed doesn't matter.
+# hash() of an int is the int itself (and close strings don't differ much in the low bits),
+# so it is scrambled first with the splitmix64 finalizer; otherwise neighbouring ids would
+# probe neighbouring bits and the false positive rate would be far above error_rate.
+# Checking the filter costs more than a dict lookup: put it in front of a store that is
+# slower to ask (a database, a remote cache), not in front of a dict.
+MASK_64 = 0xFFFFFFFFFFFFFFFF
+
+
+def mix(key) -> int:
+    value = (hash(key) + 0x9E3779B97F4A7C15) & MASK_64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return value ^ (value >> 31)
+
+
+class BloomFilter:
+    def __init__(self, capacity=1000, error_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        value = mix(key)
+        position, step = value & 0xFFFFFFFF, (value >> 32) | 1
+        for _ in range(self.hashes):
+            yield position % self.size
+            position += step
+
+    def add(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    # Same positions as _positions(), inlined: most lookups are misses and stop at the first clear bit
+    def __contains__(self, key) -> bool:
+        value = mix(key)
+        position, step = value & 0xFFFFFFFF, (value >> 32) | 1
+        bits, size = self.bits, self.size
+        for _ in range(self.hashes):
+            index = position % size
+            if not bits[index >> 3] & (1 << (index & 7)):
+                return False
+            position += step
+        return True
+
+
+# Filter over the keys of a dict (or any store with .keys())
+# New keys are added as they come (`added()`); when the filter is full it is rebuilt once
+# at twice the capacity, so the false positive rate stays at `error_rate` as the store grows.
+class KeyFilter:
+    def __init__(self, store, error_rate=0.01, capacity=1000):
+        self.store = store
+        self.error_rate = error_rate
+        self.rebuild(max(capacity, 2 * len(store)))
+
+    def rebuild(self, capacity):
+        bloom = BloomFilter(capacity, self.error_rate)
+        for key in self.store.keys():
+            bloom.add(key)
+        self.bloom = bloom
+
+    # Call after a key was added to the store
+    def added(self, key):
+        if self.bloom.count >= self.bloom.capacity:
+            self.rebuild(2 * self.bloom.capacity)
+        else:
+            self.bloom.add(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self.bloom
+
+
+# Response rendered once (body, content-length, headers) and sent as is for every request;
+# each send gets its own copy of the header list, since middlewares may append to it
+class PrebuiltResponse(Response):
+    def __init__(self, content, status_code: int, headers=None, media_type="application/json"):
+        if not isinstance(content, bytes):
+            content = json_bytes(content)
+        super().__init__(content, status_code, headers, media_type)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": list(self.raw_headers)})
+        await send({"type": "http.response.body", "body": self.body})
+
+
+# Same bytes as JSONResponse
+def json_bytes(content) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
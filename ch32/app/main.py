@@ -1,5 +1,7 @@
 from fastapi import FastAPI,Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
+
+from negative_cache import json_bytes
 
 app = FastAPI()
 
@@ -12,19 +14,34 @@ Fruits = {
 class FruitException(Exception):
     def __init__(self, fruit_name : str):
         self.fruit_name = fruit_name
-    
+
+# Misses (mostly bots asking for names that don't exist) are answered without raising:
+# only the name is encoded, the rest of the 418 body is encoded once
+NOT_VALID_PREFIX, NOT_VALID_SUFFIX = b'{"message":', b"}"
+
+# The 418 body, built in one place for read_fruit and for a raised FruitException
+def fruit_not_valid(fruit_name : str) -> Response:
+    return Response(
+        NOT_VALID_PREFIX + json_bytes(f"{fruit_name} is not valid") + NOT_VALID_SUFFIX,
+        status_code=418,
+        media_type="application/json",
+    )
+
 # Custom Exception handler
 @app.exception_handler(FruitException)
 async def fruit_exception_handler(request : Request,exc : FruitException):
-    return JSONResponse(
-        status_code= 418,
-        content={"message": f"{exc.fruit_name} is not valid"}
-    )
-    
-@app.get("/Fruits/{fruit_name}")
+    return fruit_not_valid(exc.fruit_name)
+
+# @app.get("/Fruits/{fruit_name}")
+# async def read_fruit(fruit_name : str):
+#     if fruit_name  not in Fruits:
+#         raise FruitException(fruit_name = fruit_name)
+#     return Fruits[fruit_name]
+
+@app.get("/Fruits/{fruit_name}", responses={418: {"description": "Not a valid fruit"}})
 async def read_fruit(fruit_name : str):
-    if fruit_name  not in Fruits:
-        raise FruitException(fruit_name = fruit_name)
+    if fruit_name not in Fruits:
+        return fruit_not_valid(fruit_name)
     return Fruits[fruit_name]
 
         
\ No newline at end of file